@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class MainConfig(AppConfig):
     name = 'main'
+
+    def ready(self):
+        from main.sqlite import tune_sqlite
+        from main.metrics import install_query_timer
+        connection_created.connect(tune_sqlite)
+        connection_created.connect(install_query_timer)
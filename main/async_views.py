@@ -0,0 +1,108 @@
+from django.core.paginator import Paginator
+from django.contrib.auth import logout
+from django.http.response import HttpResponseRedirect
+from django.shortcuts import render
+from django.urls import reverse
+
+from asgiref.sync import sync_to_async
+
+from main.ballot import submit_ballot, ballot_choices, AlreadyVoted
+from main.forms import RegForm, avalidate_student
+from main.mixins import user_required, admin_required
+from main.models import Election, refresh_election_status, current_election
+from main.portal import PortalUnavailable
+from main.results import election_results
+from main.views import ballot_context, voter_login
+
+# Async versions of the busiest views, routed by voting.async_urls when the
+# site is served by voting.asgi. Everything that touches the database runs
+# through sync_to_async on Django's one sync thread, as Django requires; only
+# the wait on the student portal happens on the event loop, so one process
+# can hold many logins that are waiting on it.
+
+
+def _running_election():
+    return Election.objects.filter(started=True).filter(ended=False).exists()
+
+
+async def _portal_answer(username, password):
+    """awaits the portal and returns a verify callable for RegForm that replays its answer"""
+    try:
+        verified = await avalidate_student(username, password)
+    except PortalUnavailable as error:
+        unavailable = error
+
+        def verify(username, password):
+            raise unavailable
+        return verify
+    return lambda username, password: verified
+
+
+def _unverified(username, password):
+    return False
+
+
+def _log_in(request, form):
+    user = voter_login(request, form.cleaned_data.get("username"), form.cleaned_data.get("password"))
+    if user is None:
+        form.add_error(None, 'No student has that username and password')
+        return render(request, "main/reg_form.html", {'form': form})
+    if user.hasVoted:
+        return HttpResponseRedirect(reverse('thanks'))
+    return HttpResponseRedirect(reverse('vote'))
+
+
+async def reg(request):
+    await sync_to_async(refresh_election_status)()
+    if request.method != 'POST':
+        return await sync_to_async(render)(request, "main/reg_form.html", {'form': RegForm()})
+    # RegForm must never fall back to the blocking validate_student here:
+    # a form missing a field, or with no election running, is rejected anyway
+    verify = _unverified
+    username = request.POST.get('username')
+    password = request.POST.get('password')
+    if username and password and await sync_to_async(_running_election)():
+        verify = await _portal_answer(username, password)
+    form = RegForm(request.POST, verify=verify)
+    if await sync_to_async(form.is_valid)():
+        return await sync_to_async(_log_in)(request, form)
+    return await sync_to_async(render)(request, "main/reg_form.html", {'form': form})
+
+
+def _vote(request):
+    denied = user_required(request)
+    if denied:
+        return denied
+    if request.method == 'POST':
+        try:
+            submit_ballot(request.user, ballot_choices(request.POST))
+        except AlreadyVoted:
+            pass
+        logout(request)
+        return HttpResponseRedirect(reverse('thanks'))
+    return render(request, "main/vote_form.html", ballot_context())
+
+
+async def vote(request):
+    return await sync_to_async(_vote)(request)
+
+
+def _result(request):
+    denied = admin_required(request)
+    if denied:
+        return denied
+    election = current_election()
+    snapshot = election_results(election) if election else None
+    paginator = Paginator(snapshot.standings if snapshot else [], 1)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, "main/result.html", {
+        'snapshot': snapshot,
+        'positions': page.object_list,
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    })
+
+
+async def result(request):
+    return await sync_to_async(_result)(request)
@@ -0,0 +1,220 @@
+import queue
+import random
+import threading
+import time
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from main.models import Candidate, User, Ballot, BallotChoice, TallyShard, current_election
+from main.live import ballot_committed
+
+
+class AlreadyVoted(Exception):
+    pass
+
+
+def shard_count():
+    return getattr(settings, 'VOTE_TALLY_SHARDS', 8)
+
+
+class _MissingShards(Exception):
+    pass
+
+
+def _bump_shard(candidate_ids, shard):
+    """adds a vote to one shard of each candidate, creating their shards on first use"""
+    try:
+        with transaction.atomic():
+            counted = TallyShard.objects.filter(candidate_id__in=candidate_ids, shard=shard).update(votes=F('votes') + 1)
+            if counted < len(candidate_ids):
+                raise _MissingShards
+    except _MissingShards:
+        TallyShard.objects.bulk_create(
+            [TallyShard(candidate_id=pk, shard=idx) for pk in candidate_ids for idx in range(shard_count())],
+            ignore_conflicts=True,
+        )
+        TallyShard.objects.filter(candidate_id__in=candidate_ids, shard=shard).update(votes=F('votes') + 1)
+
+
+def ballot_choices(data):
+    """{position pk: candidate pk} from the vote form's position-<pk> fields
+
+    Anything else in the form, the CSRF token included, is dropped here and
+    never reaches the database.
+    """
+    choices = {}
+    for key, value in data.items():
+        prefix, _, position = key.partition('-')
+        if prefix == 'position' and position.isdigit() and str(value).isdigit():
+            choices[int(position)] = int(value)
+    return choices
+
+
+def cast_ballot(user, choices):
+    """records a whole ballot in a single transaction
+
+    choices maps position pks to candidate pks. They are checked against
+    the current election in one query; a candidate who isn't standing for
+    the position they were picked under is left out.
+
+    hasVoted is flipped with a conditional update first, so only one of two
+    racing submissions from the same voter gets to count its votes. The
+    ballot is appended to the ledger and counted on one randomly picked
+    tally shard, so voters of a popular candidate don't queue on one row.
+    """
+    election = current_election()
+    candidates = []
+    if choices and election is not None:
+        candidates = [
+            (pk, post_id) for pk, post_id in Candidate.objects.filter(
+                pk__in=choices.values(), post_id__in=choices.keys(), election=election
+            ).values_list('pk', 'post_id')
+            if choices[post_id] == pk
+        ]
+    with transaction.atomic():
+        marked = User.objects.filter(pk=user.pk, hasVoted=False).update(hasVoted=True)
+        if not marked:
+            raise AlreadyVoted(f"{user} has already voted")
+        if election is not None:
+            ballot = Ballot.objects.create(election=election)
+            BallotChoice.objects.bulk_create([
+                BallotChoice(ballot=ballot, candidate_id=pk, position_id=post_id)
+                for pk, post_id in candidates
+            ])
+        if candidates:
+            _bump_shard([pk for pk, _ in candidates], random.randrange(shard_count()))
+            transaction.on_commit(ballot_committed)
+    user.hasVoted = True
+    return len(candidates)
+
+
+class _QueuedBallot:
+    def __init__(self, user, choices):
+        self.user = user
+        self.choices = choices
+        self.counted = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BallotWriter:
+    """one thread that commits every ballot of this process, in batches
+
+    SQLite lets one connection write at a time, so instead of request
+    threads queueing on the database lock they queue here. The writer takes
+    up to batch_size ballots, waiting at most linger seconds for more, and
+    commits them in one transaction; each is cast in its own savepoint, so
+    a rejected ballot doesn't undo the rest of the batch.
+    """
+
+    def __init__(self, batch_size, linger):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.queue = queue.Queue()
+        self.thread = None
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def submit(self, user, choices):
+        """casts the ballot on the writer thread and waits for it to be committed"""
+        self._start()
+        ballot = _QueuedBallot(user, choices)
+        self.queue.put(ballot)
+        ballot.done.wait()
+        if ballot.error is not None:
+            raise ballot.error
+        return ballot.counted
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='ballot-writer', daemon=True)
+                self.thread.start()
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._commit(self._next_batch())
+
+    def _commit(self, batch):
+        try:
+            with transaction.atomic():
+                for ballot in batch:
+                    try:
+                        ballot.counted = cast_ballot(ballot.user, ballot.choices)
+                    except Exception as error:
+                        ballot.error = error
+        except Exception as error:
+            for ballot in batch:
+                ballot.error = error
+        finally:
+            self.batches += 1
+            for ballot in batch:
+                ballot.done.set()
+
+
+_writers = {}
+
+
+def ballot_writer():
+    """the process-wide BallotWriter"""
+    config = (
+        getattr(settings, 'BALLOT_WRITER_BATCH_SIZE', 50),
+        getattr(settings, 'BALLOT_WRITER_LINGER', 0.005),
+    )
+    if _writers.get('ballots', (None,))[0] != config:
+        _writers['ballots'] = (config, BallotWriter(*config))
+    return _writers['ballots'][1]
+
+
+def submit_ballot(user, choices):
+    """casts a ballot, through the BallotWriter when BALLOT_WRITER is on"""
+    if getattr(settings, 'BALLOT_WRITER', False):
+        return ballot_writer().submit(user, choices)
+    return cast_ballot(user, choices)
+
+
+def rollup_tallies():
+    """folds the shard counters into Candidate.votes
+
+    Shards are decremented by what was read rather than zeroed, so votes
+    counted while the roll-up runs are kept.
+    """
+    folded = Counter()
+    with transaction.atomic():
+        shards = TallyShard.objects.select_for_update().filter(votes__gt=0)
+        for shard in shards:
+            TallyShard.objects.filter(pk=shard.pk).update(votes=F('votes') - shard.votes)
+            folded[shard.candidate_id] += shard.votes
+        for candidate_id, votes in folded.items():
+            Candidate.objects.filter(pk=candidate_id).update(votes=F('votes') + votes)
+    return sum(folded.values())
+
+
+def recount(election):
+    """counts every candidate's votes again from the ballot ledger"""
+    rows = BallotChoice.objects.filter(ballot__election=election).values('candidate').annotate(votes=Count('id'))
+    return {row['candidate']: row['votes'] for row in rows}
+
+
+def audit(election):
+    """returns {candidate: (tally, recount)} for every candidate whose tally disagrees with the ledger"""
+    counted = recount(election)
+    mismatches = {}
+    for candidate in Candidate.objects.with_tallies().filter(election=election):
+        if candidate.tally != counted.get(candidate.pk, 0):
+            mismatches[candidate] = (candidate.tally, counted.get(candidate.pk, 0))
+    return mismatches
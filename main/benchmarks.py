@@ -0,0 +1,337 @@
+import json
+import random
+import threading
+import time
+
+from django.contrib.auth import authenticate, login
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, transaction, OperationalError
+from django.test import RequestFactory, override_settings
+
+from main.models import Candidate, User, TallyShard, refresh_election_status, invalidate_election_cache
+from main.ballot import cast_ballot, submit_ballot, shard_count
+from main.forms import CandidateRegistrationForm, format_name
+from main.generator import generate_election
+from main.results import take_snapshot
+from main.views import RegFormView, VoteFormView
+
+
+def build_election(positions=5, candidates=4, voters=100):
+    """bulk creates a running election and returns it with its voters"""
+    election, _ = generate_election(positions, candidates, voters, name="BENCHMARK", prefix="bench")
+    return election, list(User.objects.filter(username__startswith="bench"))
+
+
+def random_ballot(election):
+    """{position pk: candidate pk}, one random candidate per position"""
+    ballot = {}
+    for position in election.positions.prefetch_related('candidates'):
+        ballot[position.pk] = random.choice(position.candidates.all()).pk
+    return ballot
+
+
+def legacy_cast_ballot(user, choices):
+    """the per-field get/save loop VoteFormView.post used to run (it looked candidates up by name)"""
+    for pk in choices.values():
+        try:
+            candidate = Candidate.objects.get(pk=pk)
+            candidate.votes += 1
+            candidate.save()
+        except Candidate.DoesNotExist:
+            pass
+    user.hasVoted = True
+    user.save()
+
+
+def _time_ballots(cast, n, positions, candidates):
+    with transaction.atomic():
+        election, voters = build_election(positions, candidates, n)
+        ballots = [random_ballot(election) for _ in voters]
+        start = time.perf_counter()
+        for voter, ballot in zip(voters, ballots):
+            cast(voter, ballot)
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return elapsed
+
+
+def bench_ballots(n=1000, positions=5, candidates=4):
+    results = []
+    for label, cast in (('legacy', legacy_cast_ballot), ('atomic', cast_ballot)):
+        elapsed = _time_ballots(cast, n, positions, candidates)
+        results.append({
+            'name': f"ballots.{label}",
+            'operations': n,
+            'seconds': elapsed,
+            'per_second': n / elapsed if elapsed else 0,
+        })
+    return results
+
+
+class _VerifiedForm:
+    def __init__(self, username, password):
+        self.cleaned_data = {'username': username, 'password': password}
+
+
+def _login_request():
+    request = RequestFactory().post('/reg/')
+    request.session = SessionStore()
+    return request
+
+
+def legacy_login(request, username, password):
+    """what RegFormView.form_valid used to do: full hash, then authenticate()"""
+    user, created = User.objects.get_or_create(username=username)
+    if created:
+        user.set_password(password)
+        user.save()
+    login(request, authenticate(username=username, password=password))
+
+
+def reg_form_login(request, username, password):
+    view = RegFormView()
+    view.setup(request)
+    view.form_valid(_VerifiedForm(username, password))
+
+
+def bench_logins(n=50):
+    """first-time voter logins on one core, with every VOTER_PASSWORD_HASHER option"""
+    results = []
+    runs = [('legacy', legacy_login, None)] + [
+        (hasher or 'unusable', reg_form_login, hasher) for hasher in ('default', 'pbkdf2_voter', None)
+    ]
+    for label, log_in, hasher in runs:
+        with transaction.atomic(), override_settings(VOTER_PASSWORD_HASHER=hasher):
+            requests = [_login_request() for _ in range(n)]
+            start = time.perf_counter()
+            for idx, request in enumerate(requests):
+                log_in(request, f"bench{idx}", "secret")
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        results.append({
+            'name': f"logins.{label}",
+            'operations': n,
+            'seconds': elapsed,
+            'per_second': n / elapsed if elapsed else 0,
+        })
+    return results
+
+
+def _cast_concurrently(voters, ballots, threads):
+    """casts the ballots from several threads at once, returning how many hit a lock error"""
+    errors = []
+    jobs = list(zip(voters, ballots))
+
+    def vote(share):
+        try:
+            for voter, ballot in share:
+                try:
+                    submit_ballot(voter, ballot)
+                except OperationalError:
+                    errors.append(voter)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=vote, args=(jobs[idx::threads],)) for idx in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(errors)
+
+
+def bench_concurrent_ballots(n=500, threads=20, positions=5, candidates=4):
+    """ballots cast from many threads at once, each on its own connection, with and without the BallotWriter
+
+    Unlike the other benchmarks this has to commit, so it cleans up after
+    itself instead of rolling back. Point it at a file database, not one
+    in use by a running election.
+    """
+    results = []
+    for label, writer in (('direct', False), ('writer', True)):
+        election, voters = build_election(positions, candidates, n)
+        try:
+            ballots = [random_ballot(election) for _ in voters]
+            with override_settings(BALLOT_WRITER=writer):
+                start = time.perf_counter()
+                errors = _cast_concurrently(voters, ballots, threads)
+                elapsed = time.perf_counter() - start
+        finally:
+            election.delete()
+            User.objects.filter(username__startswith="bench").delete()
+        results.append({
+            'name': f"concurrent_ballots.{label}",
+            'operations': n,
+            'seconds': elapsed,
+            'per_second': (n - errors) / elapsed if elapsed else 0,
+            'errors': errors,
+        })
+    return results
+
+
+# (voters, positions) the hot paths are timed at
+SCALES = [(voters, positions) for voters in (10, 1000, 100000) for positions in (5, 50)]
+
+
+def _seed_tallies(election, voters):
+    """spreads voters' worth of votes over every candidate's tally shards, as if they had all voted"""
+    shards = shard_count()
+    rows = []
+    for position in election.positions.prefetch_related('candidates'):
+        for candidate in position.candidates.all():
+            rows += [
+                TallyShard(candidate=candidate, shard=shard, votes=random.randrange(voters + 1) // shards)
+                for shard in range(shards)
+            ]
+    TallyShard.objects.bulk_create(rows)
+
+
+def _ballot_request(voter, ballot):
+    request = RequestFactory().post('/vote/', {f"position-{pk}": choice for pk, choice in ballot.items()})
+    request.session = SessionStore()
+    request.user = voter
+    return request
+
+
+def path_ballot(election, voters, n):
+    """VoteFormView.post: a whole ballot, committed through the view"""
+    ballots = [random_ballot(election) for _ in range(min(n, 20))]
+    view = VoteFormView.as_view()
+    elapsed = 0
+    for idx in range(n):
+        if idx and idx % len(voters) == 0:
+            # everyone has voted, let them vote again
+            User.objects.filter(pk__in=[voter.pk for voter in voters]).update(hasVoted=False)
+        request = _ballot_request(voters[idx % len(voters)], ballots[idx % len(ballots)])
+        start = time.perf_counter()
+        view(request)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def path_login(election, voters, n):
+    """RegFormView.form_valid for a voter who has logged in before"""
+    requests = [_login_request() for _ in range(n)]
+    start = time.perf_counter()
+    for idx, request in enumerate(requests):
+        reg_form_login(request, voters[idx % len(voters)].username, "secret")
+    return time.perf_counter() - start
+
+
+def path_refresh(election, voters, n):
+    """refresh_election_status, run by every voter page"""
+    start = time.perf_counter()
+    for _ in range(n):
+        refresh_election_status()
+    return time.perf_counter() - start
+
+
+def path_candidate_form(election, voters, n):
+    """CandidateRegistrationForm.clean and save, registering a new candidate"""
+    posts = list(election.positions.all())
+    election.started = False
+    election.save()
+    start = time.perf_counter()
+    for idx in range(n):
+        form = CandidateRegistrationForm(data={'name': f"bench new {idx}", 'level': 100, 'position': posts[idx % len(posts)].pk})
+        form.is_valid()
+        form.save(form)
+    return time.perf_counter() - start
+
+
+def path_results(election, voters, n):
+    """the standings and turnout ResultView aggregates when its snapshot is stale"""
+    start = time.perf_counter()
+    for _ in range(n):
+        take_snapshot(election)
+    return time.perf_counter() - start
+
+
+PATHS = {
+    'ballot': path_ballot,
+    'login': path_login,
+    'refresh': path_refresh,
+    'candidate_form': path_candidate_form,
+    'results': path_results,
+}
+
+
+def _result(name, n, elapsed):
+    return {
+        'name': name,
+        'operations': n,
+        'seconds': elapsed,
+        'per_second': n / elapsed if elapsed else 0,
+    }
+
+
+def _format_names(n):
+    start = time.perf_counter()
+    for idx in range(n):
+        format_name(f"mIxED   case NAME {idx}")
+    return time.perf_counter() - start
+
+
+def bench_paths(n=100, scales=SCALES, rounds=3):
+    """each hot path on its own, at every (voters, positions) scale
+
+    The election is built once per scale and every run of a path is rolled
+    back to a savepoint, so runs don't see each other's writes. Each path
+    is run rounds times and the fastest kept, as timeit does: the slower
+    runs measure whatever else the machine was doing. format_name doesn't
+    touch the database and is timed once.
+    """
+    results = [_result('paths.format_name', n * 100, min(_format_names(n * 100) for _ in range(rounds)))]
+    for voters, positions in scales:
+        with transaction.atomic():
+            election, users = build_election(positions, 4, voters)
+            _seed_tallies(election, voters)
+            for label, path in PATHS.items():
+                timings = []
+                for _ in range(rounds):
+                    invalidate_election_cache()
+                    with transaction.atomic():
+                        timings.append(path(election, users, n))
+                        transaction.set_rollback(True)
+                results.append(_result(f"paths.{label}.{voters}x{positions}", n, min(timings)))
+            transaction.set_rollback(True)
+        invalidate_election_cache()
+    return results
+
+
+def load_baseline(path):
+    """{benchmark name: seconds per operation} from a baseline file, empty if there is none"""
+    try:
+        with open(path) as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """records the results' seconds per operation, keeping the baselines of benchmarks that weren't run"""
+    baseline = load_baseline(path)
+    for result in results:
+        baseline[result['name']] = result['seconds'] / result['operations']
+    with open(path, 'w') as out:
+        json.dump(dict(sorted(baseline.items())), out, indent=2)
+        out.write('\n')
+
+
+def regressions(results, baseline, tolerance):
+    """(name, baseline, now) in seconds per operation, for results more than tolerance slower than their baseline"""
+    slower = []
+    for result in results:
+        before = baseline.get(result['name'])
+        now = result['seconds'] / result['operations']
+        if before is not None and now > before * (1 + tolerance):
+            slower.append((result['name'], before, now))
+    return slower
+
+
+BENCHMARKS = {
+    'ballots': bench_ballots,
+    'concurrent_ballots': bench_concurrent_ballots,
+    'logins': bench_logins,
+    'paths': bench_paths,
+}
@@ -1,45 +1,83 @@
 from django.core.exceptions import ValidationError
+from django.conf import settings
 from django import forms
 
-from main.models import Candidate, Position, Election, User
+from main.models import Candidate, Position, Election, User, EligibleVoter, bump_catalog_version
+from main.portal import portal_client, async_portal_client, portal_guard, verification_cache, PortalUnavailable
+from main.metrics import portal_timer
 
 from datetime import datetime
+from pathlib import Path
 
 from pytz import timezone
 
-import requests
+from asgiref.sync import sync_to_async
 
 afri = timezone('Africa/Lagos')
 
-def validate_student(username, password):
-    data = {
-        'username': username,
-        'password': password
-    }
-    try:
-        response = requests.post("https://mouauportal.edu.ng/login.php", data)
-    except requests.exceptions.ConnectionError:
+def check_voter_roll(username, password):
+    """True or False for students on the roll, None for everyone else"""
+    voter = EligibleVoter.objects.filter(student_id=username).first()
+    if voter is None:
         return None
-    if response.url == 'https://mouauportal.edu.ng/my-account-student.php':
-        jamb_page = requests.get('https://mouauportal.edu.ng/old-session-logged-in/index.php')
-        if 'JAMB NUMBER' in jamb_page.content.decode('utf-8'):
-            return True
-        return False    
-    else:
-        return False
+    return voter.check_credential(password)
+
+
+def validate_student(username, password):
+    """checks a student against the roll and/or the portal, as STUDENT_VERIFICATION says
+
+    'portal' asks the portal only, 'roll' the local voter roll only, and
+    'roll_then_portal' asks the portal about students missing from the roll.
+    """
+    mode = getattr(settings, 'STUDENT_VERIFICATION', 'portal')
+    if mode != 'portal':
+        verified = check_voter_roll(username, password)
+        if verified is not None or mode == 'roll':
+            return bool(verified)
+    cache = verification_cache()
+    verified = cache.get(username, password)
+    if verified is None:
+        with portal_timer():
+            verified = portal_guard().call(portal_client().verify, username, password)
+        cache.set(username, password, verified)
+    return verified
+
+
+async def avalidate_student(username, password):
+    mode = getattr(settings, 'STUDENT_VERIFICATION', 'portal')
+    if mode != 'portal':
+        verified = await sync_to_async(check_voter_roll)(username, password)
+        if verified is not None or mode == 'roll':
+            return bool(verified)
+    cache = verification_cache()
+    verified = await sync_to_async(cache.get)(username, password)
+    if verified is None:
+        with portal_timer():
+            verified = await portal_guard().acall(async_portal_client().verify, username, password)
+        await sync_to_async(cache.set)(username, password, verified)
+    return verified
         
 
 class RegForm(forms.Form):
     username = forms.CharField(max_length="10", widget=forms.widgets.PasswordInput())
     password = forms.CharField(max_length="10", widget=forms.widgets.PasswordInput())
 
+    def __init__(self, *args, verify=None, **kwargs):
+        # the async view awaits the portal itself and hands the answer in here
+        super().__init__(*args, **kwargs)
+        self.verify = verify or validate_student
+
     def clean(self):
         election = Election.objects.filter(started=True).filter(ended=False).last()
         if election: 
             cleaned_data = super().clean()
             username = self.cleaned_data.get('username')
             password = self.cleaned_data.get('password')
-            if validate_student(username, password):
+            try:
+                verified = self.verify(username, password)
+            except PortalUnavailable:
+                raise ValidationError('The student portal is busy, try again shortly')
+            if verified:
                 return cleaned_data
             else:
                 raise ValidationError('No student has that username and password')
@@ -87,6 +125,7 @@ class CandidateRegistrationForm(forms.Form):
         )
         position = Position.objects.get(name=form.cleaned_data.get("position"))
         position.candidates.add(candidate)
+        bump_catalog_version()
         return candidate
 
 
@@ -113,9 +152,20 @@ class PositionRegistrationForm(forms.Form):
             name = form.cleaned_data.get("name"),
             election = Election.objects.all().last()
         )
+        bump_catalog_version()
         return position 
 
     
+class BallotImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or JSON with position, candidate and level")
+
+    def clean_file(self):
+        upload = self.cleaned_data.get("file")
+        if Path(upload.name).suffix.lower() not in ('.csv', '.json'):
+            raise ValidationError("Upload a .csv or .json file")
+        return upload
+
+
 class AccessCodeForm(forms.Form):
     access_code = forms.CharField(widget=forms.widgets.PasswordInput())
 
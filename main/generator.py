@@ -0,0 +1,141 @@
+import random
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from faker import Faker
+
+from main.models import Election, Position, Candidate, User, Ballot, BallotChoice, bump_catalog_version
+from main.forms import format_name
+
+STATES = ('upcoming', 'running', 'ended')
+
+
+def _unique(value, taken, limit):
+    """value cut to limit characters, numbered if it is already taken"""
+    unique, number = value[:limit].strip(), 1
+    while unique in taken:
+        number += 1
+        suffix = f" {number}"
+        unique = value[:limit - len(suffix)].strip() + suffix
+    taken.add(unique)
+    return unique
+
+
+def _insert(template, varying, rows, batch_size):
+    """INSERTs rows with executemany, without building a model instance per row
+
+    Each row is a tuple of the varying fields' values (by attname, plain
+    values the database takes as they are); every other field is taken
+    from the template instance, prepared once.
+    """
+    fields = [field for field in template._meta.concrete_fields if not field.primary_key]
+    fields.sort(key=lambda field: varying.index(field.attname) if field.attname in varying else len(varying))
+    shared = tuple(
+        field.get_db_prep_save(field.pre_save(template, True), connection)
+        for field in fields[len(varying):]
+    )
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(template._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [row + shared for row in rows[offset:offset + batch_size]])
+
+
+def _dates(state):
+    now = datetime.now(timezone.utc)
+    if state == 'upcoming':
+        return now + timedelta(days=1), now + timedelta(days=2)
+    if state == 'ended':
+        return now - timedelta(days=2), now - timedelta(days=1)
+    return now - timedelta(days=1), now + timedelta(days=1)
+
+
+def generate_election(positions=5, candidates=4, voters=1000, turnout=0.0, name="Synthetic",
+                      prefix="MOU", state='running', seed=None, batch_size=5000):
+    """bulk creates an election with made-up positions, candidates, voters and ballots
+
+    Voters are <prefix><number>, and turnout of them have cast a ballot
+    that picks one candidate per position; some candidates are more
+    popular than others so there are winners to show. Candidates' votes
+    are written rolled up, as rollup_tallies would leave them. Everything
+    goes in with bulk inserts, batch_size rows at a time, in one
+    transaction; voters, ballots and their choices skip the ORM's
+    per-object work, which is most of the time at this size. Returns
+    (election, ballots cast).
+    """
+    if state not in STATES:
+        raise ValueError(f"{state!r} is not one of {', '.join(STATES)}")
+    if not 0 <= turnout <= 1:
+        raise ValueError("turnout is a fraction between 0 and 1")
+    if User.objects.filter(username__startswith=prefix).exists():
+        raise ValueError(f"There are already voters named {prefix}...")
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    start, end = _dates(state)
+    with transaction.atomic():
+        election = Election.objects.create(
+            name=name, start=start, end=end,
+            started=state != 'upcoming', ended=state == 'ended',
+        )
+        taken = set(Position.objects.values_list('name', flat=True))
+        Position.objects.bulk_create([
+            Position(name=_unique(fake.job().upper(), taken, 30), election=election)
+            for _ in range(positions)
+        ], batch_size=batch_size)
+        posts = list(election.positions.order_by('pk').values_list('pk', flat=True))
+        taken = set(Candidate.objects.values_list('name', flat=True))
+        Candidate.objects.bulk_create([
+            Candidate(
+                name=_unique(format_name(fake.name()), taken, 30),
+                level=rng.choice(Candidate.Levels.values),
+                post_id=post,
+                election=election,
+            )
+            for post in posts for _ in range(candidates)
+        ], batch_size=batch_size)
+        standing = {post: [] for post in posts}
+        for pk, post in election.candidates.order_by('pk').values_list('pk', 'post_id'):
+            standing[post].append(pk)
+        Position.candidates.through.objects.bulk_create([
+            Position.candidates.through(position_id=post, candidate_id=pk)
+            for post, pks in standing.items() for pk in pks
+        ], batch_size=batch_size)
+
+        cast = round(voters * turnout)
+        voted = set(rng.sample(range(voters), cast))
+        # unusable, voters log in through the portal
+        password = make_password(None)
+        _insert(User(password=password), ['username', 'hasVoted'], [
+            (f"{prefix}{idx:06d}", idx in voted) for idx in range(voters)
+        ], batch_size)
+
+        _insert(Ballot(election=election), [], [()] * cast, batch_size)
+        # SQLite doesn't hand back the new pks, so read them back
+        ballots = list(election.ballots.order_by('pk').values_list('pk', flat=True))
+        weights = {post: [rng.random() ** 2 for _ in pks] for post, pks in standing.items()}
+        votes = Counter()
+        for offset in range(0, cast, batch_size):
+            chunk = ballots[offset:offset + batch_size]
+            choices = []
+            for post, pks in standing.items():
+                if not pks:
+                    continue
+                picks = rng.choices(pks, weights[post], k=len(chunk))
+                votes.update(picks)
+                choices += [(ballot, pk, post) for ballot, pk in zip(chunk, picks)]
+            _insert(BallotChoice(), ['ballot_id', 'candidate_id', 'position_id'], choices, batch_size)
+        tallied = list(election.candidates.all())
+        for candidate in tallied:
+            candidate.votes = votes[candidate.pk]
+        Candidate.objects.bulk_update(tallied, ['votes'], batch_size=batch_size)
+    bump_catalog_version()
+    return election, cast
@@ -0,0 +1,12 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class VoterPasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with few iterations, for throwaway voter accounts only
+
+    Voters are checked by the portal or the voter roll, and their accounts
+    are deleted with the election, so their stored password never guards
+    anything for long. staff and admin keep the default hasher.
+    """
+    algorithm = 'pbkdf2_voter'
+    iterations = 1000
@@ -0,0 +1,98 @@
+import csv
+import json
+
+from pathlib import Path
+
+from django.db import transaction
+
+from main.models import EligibleVoter, Election, Position, Candidate, bump_catalog_version
+from main.forms import format_name
+
+
+def parse_rows(source, suffix):
+    """rows of CSV (with a header line) or, when suffix is .json, a JSON list of objects"""
+    if suffix.lower() == '.json':
+        return json.load(source)
+    return list(csv.DictReader(source))
+
+
+def read_rows(path):
+    """rows of a .csv or .json file"""
+    path = Path(path)
+    with open(path, newline='', encoding='utf-8') as source:
+        return parse_rows(source, path.suffix)
+
+
+def import_voter_roll(rows, replace=False, batch_size=1000):
+    """bulk loads EligibleVoter rows, returning how many were added
+
+    Each row needs a student_id and either a token (the student's one-time
+    secret) or a credential already hashed by one of Django's password
+    hashers. Students already on the roll are left alone unless replace
+    clears the roll first.
+    """
+    voters = []
+    for row in rows:
+        student_id = str(row['student_id']).strip()
+        if row.get('credential'):
+            credential = row['credential']
+        elif row.get('token'):
+            credential = EligibleVoter.make_credential(student_id, str(row['token']))
+        else:
+            raise ValueError(f"{student_id} has neither a token nor a credential")
+        voters.append(EligibleVoter(student_id=student_id, credential=credential))
+    with transaction.atomic():
+        if replace:
+            EligibleVoter.objects.all().delete()
+        before = EligibleVoter.objects.count()
+        EligibleVoter.objects.bulk_create(voters, batch_size=batch_size, ignore_conflicts=True)
+        return EligibleVoter.objects.count() - before
+
+
+def import_ballot(rows, batch_size=1000):
+    """bulk loads positions and their candidates into the election being set up
+
+    Each row has a position and, optionally, a candidate and their level.
+    Names are normalised the way the registration forms do it, and
+    positions or candidates that already exist are left alone. Returns
+    (positions added, candidates added).
+    """
+    election = Election.objects.filter(started=False).filter(ended=False).last()
+    if election is None:
+        raise ValueError("No Election has been registered")
+    levels = set(Candidate.Levels.values)
+    positions, candidates = {}, {}
+    for line, row in enumerate(rows, 1):
+        position = str(row.get('position') or '').strip().upper()
+        if not position:
+            raise ValueError(f"row {line} has no position")
+        positions.setdefault(position, None)
+        name = format_name(str(row.get('candidate') or '').strip())
+        if name:
+            try:
+                level = int(row.get('level'))
+            except (TypeError, ValueError):
+                level = None
+            if level not in levels:
+                raise ValueError(f"row {line}: {row.get('level')!r} is not a level")
+            candidates[name] = (level, position)
+    with transaction.atomic():
+        existing = set(Position.objects.filter(name__in=positions).values_list('name', flat=True))
+        Position.objects.bulk_create(
+            [Position(name=name, election=election) for name in positions if name not in existing],
+            batch_size=batch_size,
+        )
+        # SQLite doesn't hand back the new pks, so read them back
+        positions = dict(Position.objects.filter(name__in=positions).values_list('name', 'pk'))
+        taken = set(Candidate.objects.filter(name__in=candidates).values_list('name', flat=True))
+        new = {name: value for name, value in candidates.items() if name not in taken}
+        Candidate.objects.bulk_create(
+            [Candidate(name=name, level=level, post_id=positions[post], election=election) for name, (level, post) in new.items()],
+            batch_size=batch_size,
+        )
+        Position.candidates.through.objects.bulk_create([
+            Position.candidates.through(position_id=post_id, candidate_id=pk)
+            for pk, post_id in Candidate.objects.filter(name__in=new).values_list('pk', 'post_id')
+        ], batch_size=batch_size)
+    bump_catalog_version()
+    return len(positions) - len(existing), len(new)
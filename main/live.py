@@ -0,0 +1,172 @@
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import parse_cookie
+
+from asgiref.sync import sync_to_async
+
+from importlib import import_module
+from types import SimpleNamespace
+import asyncio
+import json
+import threading
+
+from main.models import current_election
+from main.results import compute_standings
+
+
+def live_standings():
+    """{position: {candidate: votes}} for the current election"""
+    close_old_connections()
+    try:
+        election = current_election()
+        if election is None:
+            return {}
+        return {
+            position['position']: {candidate['name']: candidate['votes'] for candidate in position['candidates']}
+            for position in compute_standings(election)
+        }
+    finally:
+        close_old_connections()
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+class ResultsBroadcaster:
+    """fans the live standings out to every watching dashboard
+
+    One pump task per event loop aggregates the standings at most once every
+    interval seconds, and only when a ballot was committed in this process
+    or poll seconds have passed (ballots cast by other workers are picked up
+    by the poll). Each change is encoded once and queued for every
+    subscriber: the full standings when a subscriber joins or a candidate
+    comes or goes, otherwise just the candidates whose votes moved.
+    """
+
+    def __init__(self, interval, poll):
+        self.interval = interval
+        self.poll = poll
+        self.subscribers = set()
+        self.standings = None
+        self.dirty = threading.Event()
+        self.pump = None
+        self.aggregations = 0
+
+    def notify(self):
+        """called from any thread once a ballot is committed"""
+        self.dirty.set()
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        if self.standings is not None:
+            queue.put_nowait(_event('standings', self.standings))
+        self.subscribers.add(queue)
+        if self.pump is None or self.pump.done() or self.pump.get_loop() is not asyncio.get_running_loop():
+            self.pump = asyncio.ensure_future(self._pump())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def refresh(self):
+        self.dirty.clear()
+        standings = await sync_to_async(live_standings, thread_sensitive=False)()
+        self.aggregations += 1
+        previous, self.standings = self.standings, standings
+        if previous is None or {p: set(c) for p, c in previous.items()} != {p: set(c) for p, c in standings.items()}:
+            self.publish(_event('standings', standings))
+            return
+        delta = {}
+        for position, candidates in standings.items():
+            moved = {name: votes for name, votes in candidates.items() if previous[position][name] != votes}
+            if moved:
+                delta[position] = moved
+        if delta:
+            self.publish(_event('delta', delta))
+
+    def publish(self, message):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        last = None
+        while self.subscribers:
+            if last is None or self.standings is None or self.dirty.is_set() or loop.time() - last >= self.poll:
+                last = loop.time()
+                await self.refresh()
+            await asyncio.sleep(self.interval)
+        # nobody is watching, so the standings would only go stale
+        self.standings = None
+
+
+_broadcasters = {}
+
+
+def results_broadcaster():
+    """the process-wide ResultsBroadcaster"""
+    config = (
+        getattr(settings, 'LIVE_RESULTS_INTERVAL', 0.5),
+        getattr(settings, 'LIVE_RESULTS_POLL_SECONDS', 5),
+    )
+    if _broadcasters.get('results', (None,))[0] != config:
+        _broadcasters['results'] = (config, ResultsBroadcaster(*config))
+    return _broadcasters['results'][1]
+
+
+def ballot_committed():
+    results_broadcaster().notify()
+
+
+def _is_admin(scope):
+    close_old_connections()
+    try:
+        cookies = parse_cookie(dict(scope['headers']).get(b'cookie', b'').decode('latin-1'))
+        engine = import_module(settings.SESSION_ENGINE)
+        request = SimpleNamespace(session=engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME)))
+        return get_user(request).is_superuser
+    finally:
+        close_old_connections()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def results_stream(scope, receive, send):
+    """ASGI app streaming the live standings to an admin as Server-Sent Events"""
+    if not await sync_to_async(_is_admin, thread_sensitive=False)(scope):
+        await send({'type': 'http.response.start', 'status': 403, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b"Access denied"})
+        return
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    broadcaster = results_broadcaster()
+    queue = broadcaster.subscribe()
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while True:
+            message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({message, disconnected}, timeout=15, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                message.cancel()
+                return
+            if message in done:
+                await send({'type': 'http.response.body', 'body': message.result(), 'more_body': True})
+            else:
+                message.cancel()
+                # keeps proxies from timing out a quiet stream
+                await send({'type': 'http.response.body', 'body': b": ping\n\n", 'more_body': True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnected.cancel()
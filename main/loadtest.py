@@ -0,0 +1,162 @@
+import random
+import re
+import threading
+import time
+
+from collections import defaultdict
+
+from django.db import connection
+from django.test import Client, override_settings
+
+from main.benchmarks import build_election
+from main.models import User, bump_catalog_version, invalidate_election_cache
+from main.portal_stub import PortalStub
+
+# the test client's default host, testserver, isn't in ALLOWED_HOSTS
+HOST = 'localhost'
+
+BALLOT_FIELD = re.compile(r'name="(position-\d+)"[^>]*value="(\d+)"')
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoadStats:
+    """latencies and errors per endpoint, shared by every virtual user"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def request(self, name, send, expect):
+        """times one request; anything but the expected status counts as an error"""
+        start = time.perf_counter()
+        try:
+            response = send()
+            failed = response.status_code != expect
+        except Exception:
+            response, failed = None, True
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if failed:
+                self.errors[name] += 1
+        return None if failed else response
+
+    def report(self, seconds):
+        rows = []
+        for name in sorted(self.latencies):
+            latencies = self.latencies[name]
+            rows.append({
+                'name': name,
+                'requests': len(latencies),
+                'errors': self.errors[name],
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'per_second': len(latencies) / seconds if seconds else 0,
+            })
+        return rows
+
+
+def voter(stats, username, password):
+    """reg -> vote -> thanks, as a student would"""
+    client = Client(HTTP_HOST=HOST)
+    stats.request('GET /reg/', lambda: client.get('/reg/'), 200)
+    if stats.request('POST /reg/', lambda: client.post('/reg/', {'username': username, 'password': password}), 302) is None:
+        return False
+    page = stats.request('GET /vote/', lambda: client.get('/vote/'), 200)
+    if page is None:
+        return False
+    fields = defaultdict(list)
+    for position, candidate in BALLOT_FIELD.findall(page.content.decode('utf-8')):
+        fields[position].append(candidate)
+    ballot = {position: random.choice(candidates) for position, candidates in fields.items()}
+    if stats.request('POST /vote/', lambda: client.post('/vote/', ballot), 302) is None:
+        return False
+    stats.request('GET /thanks/', lambda: client.get('/thanks/'), 200)
+    return True
+
+
+def browser(stats, user, path, stop):
+    """staff or admin refreshing one page until the voters are done"""
+    client = Client(HTTP_HOST=HOST)
+    client.force_login(user)
+    while not stop.is_set():
+        stats.request(f'GET {path}', lambda: client.get(path), 200)
+        time.sleep(0.1)
+
+
+def run_load_test(voters=200, concurrency=20, positions=5, candidates=4, latency=0.05, error_rate=0.0):
+    """runs an election day against this site with the portal stubbed out
+
+    voters virtual students, concurrency of them at a time, log in through
+    a local PortalStub with the given latency and error rate, cast a random
+    ballot and see the thanks page, while one staff user reloads the
+    candidate list and one admin the results. Requests go through the full
+    middleware stack in this process. Like the concurrent_ballots benchmark
+    it has to commit, so it removes its election and voters afterwards.
+    """
+    students = {f"load{idx:05d}": f"pw{idx}" for idx in range(voters)}
+    stats = LoadStats()
+    stop = threading.Event()
+    election, _ = build_election(positions, candidates, voters=0)
+    bump_catalog_version()
+    staff = User.objects.filter(username='staff').first() or User.objects.create_user(username='staff', password='staff', is_staff=True)
+    admin = User.objects.filter(username='admin').first() or User.objects.create_superuser(username='admin', password='admin')
+    queue = list(students.items())
+    lock = threading.Lock()
+    cast = []
+
+    def next_student():
+        with lock:
+            return queue.pop() if queue else None
+
+    def run_voters():
+        try:
+            while True:
+                student = next_student()
+                if student is None:
+                    return
+                if voter(stats, *student):
+                    cast.append(student)
+        finally:
+            connection.close()
+
+    def run_browser(user, path):
+        try:
+            browser(stats, user, path, stop)
+        finally:
+            connection.close()
+
+    try:
+        with PortalStub(students, latency=latency, error_rate=error_rate) as portal, \
+                override_settings(STUDENT_PORTAL_URL=portal.url, STUDENT_VERIFICATION='portal'):
+            browsers = [
+                threading.Thread(target=run_browser, args=(staff, '/list/')),
+                threading.Thread(target=run_browser, args=(admin, '/result/')),
+            ]
+            workers = [threading.Thread(target=run_voters) for _ in range(concurrency)]
+            start = time.perf_counter()
+            for thread in browsers + workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            stop.set()
+            for thread in browsers:
+                thread.join()
+    finally:
+        election.delete()
+        User.objects.filter(username__in=students).delete()
+        invalidate_election_cache()
+        bump_catalog_version()
+    return {
+        'seconds': elapsed,
+        'ballots': len(cast),
+        'ballots_per_second': len(cast) / elapsed if elapsed else 0,
+        'endpoints': stats.report(elapsed),
+    }
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.ballot import audit
+from main.models import Election
+
+
+class Command(BaseCommand):
+    help = "Recounts the latest election from the ballot ledger and reports candidates whose tally disagrees."
+
+    def handle(self, *args, **options):
+        election = Election.objects.last()
+        if election is None:
+            raise CommandError("No Election has been registered")
+        mismatches = audit(election)
+        for candidate, (tally, recounted) in mismatches.items():
+            self.stdout.write(f"{candidate}: tally {tally}, ledger {recounted}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} candidates disagree with the ledger")
+        self.stdout.write("Tallies match the ledger")
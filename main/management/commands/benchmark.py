@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmarks import BENCHMARKS, load_baseline, save_baseline, regressions
+
+
+def scale(value):
+    """'1000x5' -> (1000, 5)"""
+    voters, positions = value.lower().split('x')
+    return int(voters), int(positions)
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot code paths and reports throughput. Nothing is left in the database. "
+        "Timings are compared with the baseline in BENCHMARK_BASELINE; baselines only mean "
+        "something on the machine they were recorded on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"benchmarks to run: {', '.join(sorted(BENCHMARKS))} (all by default)")
+        parser.add_argument('-n', type=int, help="operations per benchmark, each has its own default")
+        parser.add_argument('--scale', type=scale, action='append', help="<voters>x<positions> to time the paths benchmark at, repeatable (all of main.benchmarks.SCALES by default)")
+        parser.add_argument('--save-baseline', action='store_true', help="record these timings as the baseline")
+        parser.add_argument('--check', action='store_true', help="fail if any benchmark regressed beyond the tolerance")
+        parser.add_argument('--tolerance', type=float, help="how much slower than the baseline counts as a regression, 0.25 is 25%% (BENCHMARK_TOLERANCE by default)")
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmark: {', '.join(sorted(unknown))}")
+        path = getattr(settings, 'BENCHMARK_BASELINE', None)
+        if (options['save_baseline'] or options['check']) and path is None:
+            raise CommandError("BENCHMARK_BASELINE is not set")
+        baseline = load_baseline(path) if path else {}
+        tolerance = options['tolerance'] if options['tolerance'] is not None else getattr(settings, 'BENCHMARK_TOLERANCE', 0.25)
+        results = []
+        for name in options['names'] or sorted(BENCHMARKS):
+            kwargs = {'n': options['n']} if options['n'] else {}
+            if name == 'paths' and options['scale']:
+                kwargs['scales'] = options['scale']
+            for result in BENCHMARKS[name](**kwargs):
+                results.append(result)
+                line = (
+                    f"{result['name']:<32} {result['operations']:>8} ops "
+                    f"{result['seconds']:>9.3f}s {result['per_second']:>10.1f}/s"
+                )
+                if 'errors' in result:
+                    line += f" {result['errors']:>6} lock errors"
+                if result['name'] in baseline:
+                    change = result['seconds'] / result['operations'] / baseline[result['name']] - 1
+                    line += f" {change:>+7.0%} vs baseline"
+                self.stdout.write(line)
+        if options['save_baseline']:
+            save_baseline(path, results)
+            self.stdout.write(f"Saved the baseline to {path}")
+        if options['check']:
+            slower = regressions(results, baseline, tolerance)
+            for name, before, now in slower:
+                self.stderr.write(f"{name} regressed: {before * 1000:.3f}ms -> {now * 1000:.3f}ms per operation")
+            if slower:
+                raise CommandError(f"{len(slower)} benchmarks are more than {tolerance:.0%} slower than their baseline")
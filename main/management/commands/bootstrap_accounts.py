@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.models import bootstrap_access_accounts
+
+
+class Command(BaseCommand):
+    help = "Creates the staff and admin accounts with their default access codes if they are missing."
+
+    def handle(self, *args, **options):
+        bootstrap_access_accounts()
+        self.stdout.write("staff and admin accounts are in place")
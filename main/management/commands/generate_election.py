@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.generator import STATES, generate_election
+
+
+class Command(BaseCommand):
+    help = "Bulk creates a made-up election with its positions, candidates, voters and cast ballots, for trying the site at scale."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default="Synthetic", help="the election's name")
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4, help="candidates per position")
+        parser.add_argument('--voters', type=int, default=10000)
+        parser.add_argument('--turnout', type=float, default=0.6, help="fraction of the voters who have voted")
+        parser.add_argument('--state', choices=STATES, default='running')
+        parser.add_argument('--prefix', default="MOU", help="voters are named <prefix><number>")
+        parser.add_argument('--seed', type=int, help="makes the names and ballots repeatable")
+        parser.add_argument('--batch-size', type=int, default=5000, help="rows per insert")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            election, ballots = generate_election(
+                positions=options['positions'],
+                candidates=options['candidates'],
+                voters=options['voters'],
+                turnout=options['turnout'],
+                name=options['name'],
+                prefix=options['prefix'],
+                state=options['state'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as error:
+            raise CommandError(f"Could not generate the election: {error}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Generated {election} ({options['state']}) with {options['positions']} positions, "
+            f"{options['positions'] * options['candidates']} candidates, {options['voters']} voters "
+            f"and {ballots} ballots in {elapsed:.2f}s"
+        )
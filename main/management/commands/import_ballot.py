@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importers import read_rows, import_ballot
+
+
+class Command(BaseCommand):
+    help = "Loads positions and candidates from a CSV or JSON file with position, candidate and level."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            rows = read_rows(options['path'])
+            positions, candidates = import_ballot(rows)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Could not import {options['path']}: {error}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Added {positions} positions and {candidates} candidates from {len(rows)} rows "
+            f"in {elapsed:.2f}s ({len(rows) / elapsed if elapsed else 0:.0f} rows/s)"
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importers import read_rows, import_voter_roll
+
+
+class Command(BaseCommand):
+    help = "Loads the eligible-voter roll from a CSV or JSON file with student_id and token or credential."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace', action='store_true', help="clear the current roll first")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            rows = read_rows(options['path'])
+            added = import_voter_roll(rows, replace=options['replace'])
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Could not import {options['path']}: {error}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Added {added} of {len(rows)} students in {elapsed:.2f}s")
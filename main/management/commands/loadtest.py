@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from main.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs virtual voters (reg, vote, thanks) and staff/admin dashboards against this site, "
+        "with the student portal replaced by a local stub, and reports latency per endpoint. "
+        "It commits to the configured database and removes what it created afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20, help="voters active at once")
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4, help="candidates per position")
+        parser.add_argument('--latency', type=float, default=0.05, help="seconds the portal stub adds to every response")
+        parser.add_argument('--error-rate', type=float, default=0, help="fraction of portal logins answered with a 503")
+
+    def handle(self, *args, **options):
+        result = run_load_test(
+            voters=options['voters'],
+            concurrency=options['concurrency'],
+            positions=options['positions'],
+            candidates=options['candidates'],
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+        )
+        self.stdout.write(f"{'endpoint':<16} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for row in result['endpoints']:
+            self.stdout.write(
+                f"{row['name']:<16} {row['requests']:>8} {row['errors']:>6} "
+                f"{row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f} {row['per_second']:>8.1f}"
+            )
+        self.stdout.write(
+            f"{result['ballots']} ballots in {result['seconds']:.2f}s ({result['ballots_per_second']:.1f} ballots/s)"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from main.portal_stub import PortalStub
+
+
+class Command(BaseCommand):
+    help = "Runs a local stand-in for the student portal. Point STUDENT_PORTAL_URL at it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--student', action='append', default=[], metavar='USERNAME:PASSWORD')
+        parser.add_argument('--latency', type=float, default=0, help="seconds added to every response")
+        parser.add_argument('--error-rate', type=float, default=0, help="fraction of logins answered with a 503")
+
+    def handle(self, *args, **options):
+        students = dict(student.split(':', 1) for student in options['student'])
+        portal = PortalStub(students, port=options['port'], latency=options['latency'], error_rate=options['error_rate'])
+        self.stdout.write(f"Student portal stub listening on {portal.url}")
+        try:
+            portal.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            portal.server.server_close()
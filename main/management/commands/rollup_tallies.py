@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.ballot import rollup_tallies
+
+
+class Command(BaseCommand):
+    help = "Folds the sharded tally counters into Candidate.votes. Safe to run while voting is open."
+
+    def handle(self, *args, **options):
+        folded = rollup_tallies()
+        self.stdout.write(f"Folded {folded} votes")
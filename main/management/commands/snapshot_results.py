@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Election
+from main.results import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Recomputes the latest election's result snapshot. Run it on a schedule while voting is open."
+
+    def handle(self, *args, **options):
+        election = Election.objects.last()
+        if election is None:
+            self.stdout.write("No election to snapshot")
+            return
+        snapshot = take_snapshot(election)
+        self.stdout.write(f"Snapshot of {len(snapshot.standings)} positions, turnout {snapshot.turnout}%")
@@ -0,0 +1,198 @@
+from django.utils.decorators import sync_and_async_middleware
+
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import threading
+import time
+
+from main.portal import CircuitBreaker, portal_stats
+
+# upper bounds, in seconds, of the request latency histogram's buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# per view: a count per bucket (the last one for slower requests), then
+# requests, seconds, queries, query seconds and portal seconds
+COUNT, SECONDS, QUERIES, QUERY_SECONDS, PORTAL_SECONDS = range(len(BUCKETS) + 1, len(BUCKETS) + 6)
+
+
+class _Shard:
+    """one thread's metrics; only that thread ever writes to it"""
+
+    def __init__(self):
+        self.views = defaultdict(lambda: [0] * (PORTAL_SECONDS + 1))
+        self.statuses = defaultdict(int)
+
+
+_shards = []
+_local = threading.local()
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        # list.append is atomic, no lock needed
+        _shards.append(shard)
+    return shard
+
+
+class _RequestTimings:
+    __slots__ = ('queries', 'query_seconds', 'portal_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.portal_seconds = 0.0
+
+
+# the timings of the request being handled; sync_to_async carries it into
+# the thread that runs the database work of an async view
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    """database execute wrapper adding each query to the current request's timings"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.query_seconds += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver putting time_queries on every new connection"""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+@contextmanager
+def portal_timer():
+    """adds the time spent in the block to the current request's portal time"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.portal_seconds += time.perf_counter() - start
+
+
+def _record(request, response, timings, elapsed):
+    match = getattr(request, 'resolver_match', None)
+    view = match.url_name if match and match.url_name else 'unmatched'
+    shard = _shard()
+    series = shard.views[view]
+    series[bisect_left(BUCKETS, elapsed)] += 1
+    series[COUNT] += 1
+    series[SECONDS] += elapsed
+    series[QUERIES] += timings.queries
+    series[QUERY_SECONDS] += timings.query_seconds
+    series[PORTAL_SECONDS] += timings.portal_seconds
+    shard.statuses[(view, response.status_code)] += 1
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """times every request and counts its queries, recorded per URL name
+
+    Each thread aggregates into its own shard, so recording takes no lock;
+    the shards are only summed when /metrics/ is read.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings = _RequestTimings()
+            token = _current.set(timings)
+            start = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, timings, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            timings = _RequestTimings()
+            token = _current.set(timings)
+            start = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, timings, time.perf_counter() - start)
+            return response
+    return middleware
+
+
+def collect():
+    """every thread's shard summed: ({view: series}, {(view, status): requests})"""
+    views = defaultdict(lambda: [0] * (PORTAL_SECONDS + 1))
+    statuses = defaultdict(int)
+    for shard in list(_shards):
+        # copy() is atomic, iterating a dict another thread adds to is not
+        for view, series in shard.views.copy().items():
+            views[view] = [total + value for total, value in zip(views[view], list(series))]
+        for key, requests in shard.statuses.copy().items():
+            statuses[key] += requests
+    return views, statuses
+
+
+def reset_metrics():
+    """forgets everything recorded so far"""
+    for shard in list(_shards):
+        shard.views.clear()
+        shard.statuses.clear()
+
+
+def _line(name, labels, value):
+    if labels:
+        labels = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        return f"{name}{{{labels}}} {value}"
+    return f"{name} {value}"
+
+
+def render_metrics():
+    """the metrics in Prometheus' text exposition format"""
+    views, statuses = collect()
+    lines = [
+        "# HELP voting_request_seconds Time to answer a request, by URL name.",
+        "# TYPE voting_request_seconds histogram",
+    ]
+    for view, series in sorted(views.items()):
+        cumulative = 0
+        for bound, requests in zip(BUCKETS, series):
+            cumulative += requests
+            lines.append(_line('voting_request_seconds_bucket', {'view': view, 'le': bound}, cumulative))
+        lines.append(_line('voting_request_seconds_bucket', {'view': view, 'le': '+Inf'}, series[COUNT]))
+        lines.append(_line('voting_request_seconds_sum', {'view': view}, series[SECONDS]))
+        lines.append(_line('voting_request_seconds_count', {'view': view}, series[COUNT]))
+    for name, index, description in (
+        ('voting_request_queries_total', QUERIES, "SQL queries run by requests, by URL name."),
+        ('voting_request_query_seconds_total', QUERY_SECONDS, "Time requests spent in SQL queries, by URL name."),
+        ('voting_request_portal_seconds_total', PORTAL_SECONDS, "Time requests spent verifying students, by URL name."),
+    ):
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        lines += [_line(name, {'view': view}, series[index]) for view, series in sorted(views.items())]
+    lines += ["# HELP voting_responses_total Responses sent, by URL name and status.", "# TYPE voting_responses_total counter"]
+    lines += [
+        _line('voting_responses_total', {'view': view, 'status': status}, requests)
+        for (view, status), requests in sorted(statuses.items())
+    ]
+    stats = portal_stats()
+    circuit_state = stats.pop('circuit_state')
+    lines += ["# HELP voting_portal_circuit_state The portal circuit breaker's state.", "# TYPE voting_portal_circuit_state gauge"]
+    lines += [
+        _line('voting_portal_circuit_state', {'state': state}, int(circuit_state == state))
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+    ]
+    lines += ["# HELP voting_portal_in_flight Portal calls running now.", "# TYPE voting_portal_in_flight gauge"]
+    lines.append(_line('voting_portal_in_flight', {}, stats.pop('in_flight')))
+    for name, value in sorted(stats.items()):
+        lines += [f"# TYPE voting_portal_{name}_total counter", _line(f'voting_portal_{name}_total', {}, value)]
+    return '\n'.join(lines) + '\n'
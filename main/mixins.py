@@ -2,46 +2,45 @@ from django.shortcuts import redirect, reverse
 from django.contrib import messages
 from django.http.response import HttpResponseRedirect
 
-from main.models import User, refresh_election_status
+from main.models import refresh_election_status, bootstrap_access_accounts
+
+
+def user_required(request):
+    """None when a voter is logged in, otherwise the redirect to send instead"""
+    refresh_election_status()
+    if not request.user.is_authenticated:
+        return redirect(reverse('reg'))
+    return None
+
+
+def staff_required(request):
+    bootstrap_access_accounts()
+    refresh_election_status()
+    if request.user.is_staff:
+        return None
+    messages.add_message(request, messages.ERROR, "Access denied")
+    return HttpResponseRedirect(reverse('access_code') + '?next=' + request.path)
+
+
+def admin_required(request):
+    bootstrap_access_accounts()
+    refresh_election_status()
+    if request.user.is_superuser:
+        return None
+    messages.add_message(request, messages.ERROR, "Access denied")
+    return HttpResponseRedirect(reverse('access_code') + '?next=' + request.path)
 
 
 class UserRequiredMixin:
     def dispatch(self, request, *args, **kwargs):
-        refresh_election_status()
-        if not request.user.is_authenticated:
-            return redirect(reverse('reg'))
-        else: 
-            return super().dispatch(request, *args, **kwargs)
+        return user_required(request) or super().dispatch(request, *args, **kwargs)
 
 
 class StaffRequiredMixin:
     def dispatch(self, request, *args, **kwargs):
-        staff, created = User.objects.get_or_create(username='staff', is_staff=True)
-        if created:
-            staff.set_password('staff')
-            staff.save()
-        admin, created = User.objects.get_or_create(username='admin', is_staff=True, is_superuser=True)
-        if created:
-            admin.set_password('admin')
-            admin.save()
-        refresh_election_status()
-        
-        if request.user.is_staff:
-            return super().dispatch(request, *args, **kwargs)            
-        else:
-            messages.add_message(self.request, messages.ERROR, "Access denied")
-            return HttpResponseRedirect(reverse('access_code') + '?next=' + request.path)
+        return staff_required(request) or super().dispatch(request, *args, **kwargs)
 
 
 class AdminRequiredMixin:
     def dispatch(self, request, *args, **kwargs):
-        admin, created = User.objects.get_or_create(username='admin', is_staff=True, is_superuser=True)
-        if created:
-            admin.set_password('admin')
-            admin.save()
-        refresh_election_status()
-        if request.user.is_superuser:
-            return super().dispatch(request, *args, **kwargs)
-        else:
-            messages.add_message(self.request, messages.ERROR, "Access denied")
-            return HttpResponseRedirect(reverse('access_code') + '?next=' + request.path)
\ No newline at end of file
+        return admin_required(request) or super().dispatch(request, *args, **kwargs)
@@ -1,9 +1,18 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.contrib.auth.hashers import check_password
 from django.db import models 
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac, constant_time_compare
 
 from pytz import timezone
 from datetime import datetime
 
+import time
+
 afri = timezone('Africa/Lagos')
 
 class CustomAccountManager(BaseUserManager):
@@ -60,12 +69,45 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.username}"
 
 
+_access_accounts = {'bootstrapped': False}
+
+
+def bootstrap_access_accounts():
+    """creates the staff and admin accounts with their default access codes
+
+    Only the first call in a process touches the database.
+    """
+    if _access_accounts['bootstrapped']:
+        return
+    existing = set(User.objects.filter(username__in=('staff', 'admin')).values_list('username', flat=True))
+    if 'staff' not in existing:
+        User.objects.create_user(username='staff', password='staff', is_staff=True)
+    if 'admin' not in existing:
+        User.objects.create_superuser(username='admin', password='admin')
+    _access_accounts['bootstrapped'] = True
+
+
+def forget_access_accounts():
+    _access_accounts['bootstrapped'] = False
+
+
+class CandidateQuerySet(models.QuerySet):
+
+    def with_tallies(self):
+        """annotates tally: the rolled-up votes plus whatever is still in the shards"""
+        return self.annotate(tally=F('votes') + Coalesce(Sum('shards__votes'), 0))
+
+
 class Candidate(models.Model):
 
     class Meta:
         get_latest_by = "votes"
         ordering = ["votes", "level"]
         default_related_name = "aspirant"
+        constraints = [
+            # also the index behind filtering an election's candidates by position
+            models.UniqueConstraint(fields=['election', 'post', 'name'], name='unique_candidate_per_position'),
+        ]
 
     class Levels(models.IntegerChoices):
         one = 100
@@ -80,6 +122,8 @@ class Candidate(models.Model):
     post = models.ForeignKey('main.Position', on_delete=models.SET_NULL, null=True)
     election = models.ForeignKey('main.Election', on_delete=models.CASCADE, related_name='candidates')
 
+    objects = CandidateQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -92,21 +136,69 @@ class Position(models.Model):
     def __str__(self):
         return self.name 
 
-def refresh_election_status():
+_current_election = {'election': None, 'expires': 0}
+
+
+def current_election():
+    """the latest Election, cached in-process for ELECTION_CACHE_SECONDS"""
+    now = time.monotonic()
+    if _current_election['expires'] <= now:
+        _current_election['election'] = Election.objects.last()
+        _current_election['expires'] = now + getattr(settings, 'ELECTION_CACHE_SECONDS', 30)
+    return _current_election['election']
+
+
+def invalidate_election_cache():
+    _current_election['expires'] = 0
+
+
+def catalog_version():
+    """changes whenever a position or candidate is added or removed
+
+    Kept in the default cache so every worker sees the same version; the
+    ballot and voters list fragments are cached under it.
+    """
+    version = cache.get('catalog-version')
+    if version is None:
+        cache.add('catalog-version', 1, None)
+        version = cache.get('catalog-version', 1)
+    return version
+
+
+def bump_catalog_version():
     try:
-        election = Election.objects.all().last()
-        if afri.localize(datetime.now()) >= election.start:
-            election.started = True
-            election.save()
-        if afri.localize(datetime.now()) >= election.end:
-            election.ended = True
-            election.save()
-        return election
-    except:
-        pass
-    return None
+        cache.incr('catalog-version')
+    except ValueError:
+        cache.set('catalog-version', 2, None)
+
+
+def refresh_election_status():
+    """works out started/ended from the clock, writing each flag only the first time it flips"""
+    election = current_election()
+    if election is None:
+        return None
+    now = afri.localize(datetime.now())
+    if not election.started and now >= election.start:
+        Election.objects.filter(pk=election.pk, started=False).update(started=True)
+        election.started = True
+    if not election.ended and now >= election.end:
+        Election.objects.filter(pk=election.pk, ended=False).update(ended=True)
+        election.ended = True
+    return election
 
 class Election(models.Model):
+
+    class Meta:
+        # Partial rather than on (started, ended, id): Django compiles the
+        # boolean lookups to "started AND NOT ended", which SQLite can only
+        # match against an index's WHERE clause, never its columns.
+        indexes = [
+            # filter(started=True, ended=False).last(), the running election
+            models.Index(fields=['id'], name='election_running_idx', condition=Q(started=True, ended=False)),
+            # filter(started=False, ended=False).last(), the one still being set up
+            models.Index(fields=['id'], name='election_upcoming_idx', condition=Q(started=False, ended=False)),
+        ]
+
     name = models.CharField(max_length=20)
     start = models.DateTimeField()
     end = models.DateTimeField()
@@ -117,5 +209,105 @@ class Election(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        invalidate_election_cache()
         return super().save(*args, **kwargs)
 
+
+
+class Ballot(models.Model):
+    """one row per ballot cast, never updated. It does not record the voter"""
+    election = models.ForeignKey('main.Election', on_delete=models.CASCADE, related_name='ballots')
+    cast_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Ballots are append-only')
+        return super().save(*args, **kwargs)
+
+
+class BallotChoice(models.Model):
+    ballot = models.ForeignKey('main.Ballot', on_delete=models.CASCADE, related_name='choices')
+    candidate = models.ForeignKey('main.Candidate', on_delete=models.CASCADE, related_name='choices')
+    position = models.ForeignKey('main.Position', on_delete=models.SET_NULL, null=True, related_name='choices')
+
+
+class TallyShard(models.Model):
+    """one of VOTE_TALLY_SHARDS counters per candidate, folded into Candidate.votes by rollup_tallies"""
+
+    class Meta:
+        unique_together = ('candidate', 'shard')
+
+    candidate = models.ForeignKey('main.Candidate', on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+
+class EligibleVoter(models.Model):
+    """a student on the voter roll, imported before the election
+
+    credential is either an HMAC of the student's one-time token, made by
+    make_credential, or any hash Django's password hashers understand.
+    """
+    student_id = models.CharField(max_length=20, unique=True)
+    credential = models.CharField(max_length=128)
+
+    def __str__(self):
+        return self.student_id
+
+    @staticmethod
+    def make_credential(student_id, secret):
+        return 'hmac$' + salted_hmac('main.EligibleVoter', f"{student_id}\0{secret}").hexdigest()
+
+    def check_credential(self, secret):
+        if self.credential.startswith('hmac$'):
+            return constant_time_compare(self.credential, self.make_credential(self.student_id, secret))
+        return check_password(secret, self.credential)
+
+
+class ResultSnapshot(models.Model):
+    """an election's standings as main.results last computed them, served by ResultView"""
+    election = models.OneToOneField('main.Election', on_delete=models.CASCADE, related_name='results')
+    standings = models.JSONField(default=list)
+    registered = models.PositiveIntegerField(default=0)
+    voted = models.PositiveIntegerField(default=0)
+    catalog_version = models.PositiveIntegerField(default=1)
+    computed_at = models.DateTimeField()
+
+    @property
+    def turnout(self):
+        if not self.registered:
+            return 0
+        return round(100 * self.voted / self.registered, 1)
+
+
+class ElectionArchive(models.Model):
+    """what is kept of an election once main.reset has deleted it"""
+    name = models.CharField(max_length=20)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    standings = models.JSONField(default=list)
+    registered = models.PositiveIntegerField(default=0)
+    voted = models.PositiveIntegerField(default=0)
+    ballots = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RequestProfile(models.Model):
+    """a sampled profile of one request, kept by main.profiling as folded stacks for flame graph tools"""
+
+    class Meta:
+        ordering = ['-created_at']
+
+    path = models.CharField(max_length=200)
+    view = models.CharField(max_length=50, blank=True)
+    status = models.PositiveSmallIntegerField()
+    seconds = models.FloatField()
+    samples = models.PositiveIntegerField()
+    stacks = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.seconds:.3f}s)"
@@ -0,0 +1,454 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+
+from asgiref.sync import sync_to_async
+
+from collections import OrderedDict, deque
+import asyncio
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+LOGIN_PATH = '/login.php'
+ACCOUNT_PATH = '/my-account-student.php'
+JAMB_PATH = '/old-session-logged-in/index.php'
+
+
+def _portal_settings():
+    return (
+        getattr(settings, 'STUDENT_PORTAL_URL', 'https://mouauportal.edu.ng').rstrip('/'),
+        getattr(settings, 'STUDENT_PORTAL_TIMEOUT', (3, 5)),
+        getattr(settings, 'STUDENT_PORTAL_POOL_SIZE', 20),
+    )
+
+
+class PortalClient:
+    """verifies student logins against the university portal
+
+    Connections are pooled across logins, but every login gets its own
+    cookie jar so one student's portal session never leaks into another's.
+    Returns True or False, or None when the portal can't be reached in time.
+    """
+
+    def __init__(self, base_url, timeout, pool_size):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+
+    def _session(self):
+        session = requests.Session()
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    def verify(self, username, password):
+        session = self._session()
+        data = {
+            'username': username,
+            'password': password
+        }
+        try:
+            response = session.post(self.base_url + LOGIN_PATH, data, timeout=self.timeout)
+            # a portal error is not a wrong password
+            response.raise_for_status()
+            if response.url != self.base_url + ACCOUNT_PATH:
+                return False
+            jamb_page = session.get(self.base_url + JAMB_PATH, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return None
+        return 'JAMB NUMBER' in jamb_page.content.decode('utf-8')
+
+
+class AsyncPortalClient:
+    """the asyncio flavour of PortalClient, for async views
+
+    Uses httpx when it is installed; otherwise the blocking client runs in
+    a worker thread.
+    """
+
+    def __init__(self, base_url, timeout, pool_size):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.transport = None
+        if httpx is not None:
+            self.transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=pool_size))
+        else:
+            self.fallback = PortalClient(base_url, timeout, pool_size)
+
+    async def verify(self, username, password):
+        if self.transport is None:
+            return await sync_to_async(self.fallback.verify, thread_sensitive=False)(username, password)
+        connect, read = self.timeout
+        client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=httpx.Timeout(read, connect=connect),
+            follow_redirects=True,
+        )
+        data = {
+            'username': username,
+            'password': password
+        }
+        try:
+            response = await client.post(self.base_url + LOGIN_PATH, data=data)
+            response.raise_for_status()
+            if str(response.url) != self.base_url + ACCOUNT_PATH:
+                return False
+            jamb_page = await client.get(self.base_url + JAMB_PATH)
+        except httpx.HTTPError:
+            return None
+        return 'JAMB NUMBER' in jamb_page.content.decode('utf-8')
+
+
+class PortalUnavailable(Exception):
+    """the portal is failing or already has too many logins waiting on it"""
+
+
+class CircuitBreaker:
+    """stops calling the portal once too many recent calls have failed
+
+    Closed, it lets calls through and remembers the last window outcomes.
+    When at least min_calls of them are in and failure_rate of them failed
+    it opens, rejecting every call for reset_timeout seconds. Then one trial
+    call is let through (half-open): success closes it again, failure
+    reopens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, window, failure_rate, min_calls, reset_timeout):
+        self.outcomes = deque(maxlen=window)
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = 0
+        self.trial_running = False
+        self.opened = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_running = False
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self.trial_running):
+                self.rejected += 1
+                raise PortalUnavailable("The student portal is not responding")
+            if self.state == self.HALF_OPEN:
+                self.trial_running = True
+
+    def record(self, succeeded):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.trial_running = False
+                if succeeded:
+                    self.state = self.CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(succeeded)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures >= self.failure_rate * len(self.outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.opened += 1
+        self.outcomes.clear()
+
+
+class Bulkhead:
+    """caps how many portal calls can be in flight at once
+
+    A call waits up to queue_timeout seconds for a free slot, then gives up
+    so the worker is freed instead of piling onto a slow portal. Async
+    calls wait on an asyncio.Semaphore of their event loop's own, so the
+    loop keeps running while they wait; under ASGI every login is async.
+    """
+
+    def __init__(self, max_in_flight, queue_timeout):
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.async_slots = weakref.WeakKeyDictionary()
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def _reject(self):
+        with self.lock:
+            self.rejected += 1
+        raise PortalUnavailable("Too many logins are waiting on the student portal")
+
+    def acquire(self):
+        if not self.slots.acquire(True, self.queue_timeout):
+            self._reject()
+        with self.lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def _loop_slots(self):
+        loop = asyncio.get_running_loop()
+        slots = self.async_slots.get(loop)
+        if slots is None:
+            slots = self.async_slots[loop] = asyncio.BoundedSemaphore(self.max_in_flight)
+        return slots
+
+    async def aacquire(self):
+        try:
+            await asyncio.wait_for(self._loop_slots().acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject()
+        with self.lock:
+            self.in_flight += 1
+
+    def arelease(self):
+        with self.lock:
+            self.in_flight -= 1
+        self._loop_slots().release()
+
+
+class PortalGuard:
+    """runs portal calls through a CircuitBreaker and a Bulkhead
+
+    A call that returns None (portal unreachable or too slow) counts as a
+    failure.
+    """
+
+    def __init__(self, breaker, bulkhead):
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.calls = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def call(self, verify, *args):
+        # the slot is taken first, so a half-open trial is only claimed by
+        # a call that will run; whatever happens to it is then recorded
+        self.bulkhead.acquire()
+        try:
+            self.breaker.before_call()
+            try:
+                verified = verify(*args)
+            except BaseException:
+                self._record(None)
+                raise
+        finally:
+            self.bulkhead.release()
+        self._record(verified)
+        return verified
+
+    async def acall(self, verify, *args):
+        await self.bulkhead.aacquire()
+        try:
+            self.breaker.before_call()
+            try:
+                verified = await verify(*args)
+            except BaseException:
+                # an error, or the login was cancelled because the client left
+                self._record(None)
+                raise
+        finally:
+            self.bulkhead.arelease()
+        self._record(verified)
+        return verified
+
+    def _record(self, verified):
+        with self.lock:
+            self.calls += 1
+            if verified is None:
+                self.failures += 1
+        self.breaker.record(verified is not None)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'circuit_state': self.breaker.state,
+            'circuit_opened': self.breaker.opened,
+            'circuit_rejected': self.breaker.rejected,
+            'in_flight': self.bulkhead.in_flight,
+            'bulkhead_rejected': self.bulkhead.rejected,
+        }
+
+
+_clients = {}
+
+
+def portal_client():
+    """the process-wide PortalClient for the configured portal"""
+    config = _portal_settings()
+    if _clients.get('sync', (None,))[0] != config:
+        _clients['sync'] = (config, PortalClient(*config))
+    return _clients['sync'][1]
+
+
+def _guard_settings():
+    return (
+        getattr(settings, 'STUDENT_PORTAL_BREAKER_WINDOW', 20),
+        getattr(settings, 'STUDENT_PORTAL_BREAKER_FAILURE_RATE', 0.5),
+        getattr(settings, 'STUDENT_PORTAL_BREAKER_MIN_CALLS', 10),
+        getattr(settings, 'STUDENT_PORTAL_BREAKER_RESET_TIMEOUT', 30),
+        getattr(settings, 'STUDENT_PORTAL_MAX_IN_FLIGHT', 10),
+        getattr(settings, 'STUDENT_PORTAL_QUEUE_TIMEOUT', 0.5),
+    )
+
+
+def portal_guard():
+    """the process-wide PortalGuard shared by the sync and async clients"""
+    config = _guard_settings()
+    if _clients.get('guard', (None,))[0] != config:
+        window, failure_rate, min_calls, reset_timeout, max_in_flight, queue_timeout = config
+        _clients['guard'] = (config, PortalGuard(
+            CircuitBreaker(window, failure_rate, min_calls, reset_timeout),
+            Bulkhead(max_in_flight, queue_timeout),
+        ))
+    return _clients['guard'][1]
+
+
+def portal_stats():
+    """counters for monitoring the portal dependency"""
+    stats = portal_guard().stats()
+    stats.update({f"cache_{name}": value for name, value in verification_cache().stats().items()})
+    return stats
+
+
+def async_portal_client():
+    config = _portal_settings()
+    if _clients.get('async', (None,))[0] != config:
+        _clients['async'] = (config, AsyncPortalClient(*config))
+    return _clients['async'][1]
+
+
+class LocalVerificationBackend:
+    """least-recently-used entries in this process's memory, each kept for ttl seconds"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class SharedVerificationBackend:
+    """a Django cache alias, so every worker shares the same entries"""
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+
+class VerificationCache:
+    """remembers portal answers so repeat logins skip the round trip
+
+    Keys are an HMAC of username and password salted with SECRET_KEY, so
+    credentials are never stored. Only definite answers are cached; None
+    (portal unreachable) is not.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, username, password):
+        return 'portal:' + salted_hmac('main.portal.VerificationCache', f"{username}\0{password}").hexdigest()
+
+    def get(self, username, password):
+        verified = self.backend.get(self.key(username, password))
+        with self.lock:
+            if verified is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return verified
+
+    def set(self, username, password, verified):
+        if verified is not None:
+            self.backend.set(self.key(username, password), verified)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class NoVerificationCache:
+    def get(self, username, password):
+        return None
+
+    def set(self, username, password, verified):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': 0}
+
+
+def _cache_settings():
+    return (
+        getattr(settings, 'STUDENT_VERIFICATION_CACHE', 'local'),
+        getattr(settings, 'STUDENT_VERIFICATION_CACHE_TTL', 600),
+        getattr(settings, 'STUDENT_VERIFICATION_CACHE_SIZE', 10000),
+    )
+
+
+def verification_cache():
+    """the process-wide VerificationCache chosen by STUDENT_VERIFICATION_CACHE
+
+    'local' keeps entries in process memory, any other value names a
+    Django cache alias, and None turns caching off.
+    """
+    config = _cache_settings()
+    if _clients.get('cache', (None,))[0] != config:
+        backend, ttl, max_entries = config
+        if backend is None:
+            cache = NoVerificationCache()
+        elif backend == 'local':
+            cache = VerificationCache(LocalVerificationBackend(ttl, max_entries))
+        else:
+            cache = VerificationCache(SharedVerificationBackend(backend, ttl))
+        _clients['cache'] = (config, cache)
+    return _clients['cache'][1]
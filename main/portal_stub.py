@@ -0,0 +1,93 @@
+import random
+import threading
+import time
+
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class PortalStubHandler(BaseHTTPRequestHandler):
+    """answers the three portal pages validate_student visits"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, body=b"", headers=()):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location, headers=()):
+        self._respond(302, headers=[('Location', location), *headers])
+
+    def _student(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        if 'student' in cookie:
+            return cookie['student'].value
+        return None
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if random.random() < self.server.error_rate:
+            self._respond(503, b"Service Unavailable")
+            return
+        username = data.get('username', [''])[0]
+        password = data.get('password', [''])[0]
+        if username and self.server.students.get(username) == password:
+            self._redirect('/my-account-student.php', [('Set-Cookie', f'student={username}; Path=/')])
+        else:
+            self._redirect('/login.php')
+
+    def do_GET(self):
+        if self.path == '/old-session-logged-in/index.php':
+            if self._student() in self.server.students:
+                self._respond(200, f"<td>JAMB NUMBER</td><td>{self._student()}</td>".encode('utf-8'))
+            else:
+                self._redirect('/login.php')
+        elif self.path == '/my-account-student.php':
+            self._respond(200, b"Welcome")
+        else:
+            self._respond(200, b"<form method='post'></form>")
+
+
+class PortalStub:
+    """a local stand-in for the student portal, started on a free port
+
+    students maps usernames to passwords. latency is added to every response,
+    in seconds, and error_rate is the fraction of logins answered with a 503.
+    """
+
+    def __init__(self, students=None, host='127.0.0.1', port=0, latency=0, error_rate=0):
+        self.server = ThreadingHTTPServer((host, port), PortalStubHandler)
+        self.server.daemon_threads = True
+        self.server.students = dict(students or {})
+        self.server.latency = latency
+        self.server.error_rate = error_rate
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
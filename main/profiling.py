@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from collections import Counter
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+from main.models import RequestProfile
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold(frame):
+    """a stack as one line of frame labels, outermost first, joined by ;"""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Sampler:
+    """records one thread's stack every interval seconds, from a thread of its own
+
+    Nothing is added to the profiled thread, so its code runs at full
+    speed; the cost is the sampler waking up and walking the stack.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # once stopped, the thread is only waiting in __exit__ for this one
+            if frame is not None and not self.stop.is_set():
+                self.stacks[fold(frame)] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        self.thread.join()
+
+    def folded(self):
+        """the samples in the folded format flamegraph.pl and speedscope read"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _requested(request):
+    """staff asked for this request to be profiled, or it was picked at PROFILE_SAMPLE_RATE"""
+    # straight from META: building request.headers or request.GET for
+    # every request would cost more than the rest of this check
+    flagged = request.META.get('HTTP_X_PROFILE') or (
+        'profile' in request.META.get('QUERY_STRING', '') and 'profile' in request.GET
+    )
+    if flagged:
+        return request.user.is_staff
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _keep(request, response, sampler, elapsed):
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        path=request.get_full_path()[:200],
+        view=(match.url_name or '') if match else '',
+        status=response.status_code,
+        seconds=elapsed,
+        samples=sum(sampler.stacks.values()),
+        stacks=sampler.folded(),
+    )
+    keep = getattr(settings, 'PROFILE_KEEP', 50)
+    stale = RequestProfile.objects.values_list('pk', flat=True)[keep:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
+
+
+@sync_and_async_middleware
+def profile_middleware(get_response):
+    """samples where a request spends its time when staff ask for it
+
+    A staff user adds an X-Profile header or a profile query parameter to
+    any page; PROFILE_SAMPLE_RATE also picks that fraction of everyone's
+    requests. The stacks of the thread answering the request are sampled
+    every PROFILE_INTERVAL seconds and kept as a RequestProfile, which
+    staff download from /profiles/. Requests that aren't profiled only
+    pay for the check. Async views are passed through unprofiled: their
+    work moves between threads, which a per-thread sampler can't follow.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            return await get_response(request)
+        return middleware
+
+    def middleware(request):
+        if not _requested(request):
+            return get_response(request)
+        start = time.perf_counter()
+        with Sampler(threading.get_ident(), getattr(settings, 'PROFILE_INTERVAL', 0.005)) as sampler:
+            response = get_response(request)
+        profile = _keep(request, response, sampler, time.perf_counter() - start)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+    return middleware
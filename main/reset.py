@@ -0,0 +1,136 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.models import (
+    User,
+    Election,
+    ElectionArchive,
+    Position,
+    Candidate,
+    Ballot,
+    BallotChoice,
+    TallyShard,
+    ResultSnapshot,
+    invalidate_election_cache,
+    bump_catalog_version,
+)
+from main.results import take_snapshot
+
+PROGRESS_KEY = 'election-reset'
+
+
+def _voters():
+    return User.objects.exclude(username="staff").exclude(username="admin")
+
+
+def _steps():
+    """what to delete, children before parents, so nothing needs a cascade"""
+    voters = _voters()
+    return [
+        ('ballot choices', BallotChoice.objects.all()),
+        ('ballots', Ballot.objects.all()),
+        ('tally shards', TallyShard.objects.all()),
+        ('position candidates', Position.candidates.through.objects.all()),
+        ('candidates', Candidate.objects.all()),
+        ('positions', Position.objects.all()),
+        ('result snapshots', ResultSnapshot.objects.all()),
+        ('elections', Election.objects.all()),
+        ('voter groups', User.groups.through.objects.filter(user__in=voters)),
+        ('voter permissions', User.user_permissions.through.objects.filter(user__in=voters)),
+        ('voters', voters),
+    ]
+
+
+def reset_progress():
+    """the last reset's progress: state, step, deleted rows and error, or None"""
+    return cache.get(PROGRESS_KEY)
+
+
+def _report(**progress):
+    current = cache.get(PROGRESS_KEY) or {}
+    current.update(progress, updated=timezone.now())
+    cache.set(PROGRESS_KEY, current, None)
+
+
+def archive_elections():
+    """keeps every election's final standings and turnout as ElectionArchive rows"""
+    archived = []
+    for election in Election.objects.all():
+        snapshot = take_snapshot(election)
+        archived.append(ElectionArchive(
+            name=election.name,
+            start=election.start,
+            end=election.end,
+            standings=snapshot.standings,
+            registered=snapshot.registered,
+            voted=snapshot.voted,
+            ballots=election.ballots.count(),
+        ))
+    ElectionArchive.objects.bulk_create(archived)
+    return len(archived)
+
+
+def reset_election(batch_size=None):
+    """archives the results, then deletes every election with its ballots and voters
+
+    Rows are deleted batch_size at a time in plain DELETE statements,
+    children first, instead of through Django's collector, which would load
+    every row and cascade in Python. Each batch commits on its own, so a
+    large reset never holds the database for long. Returns the rows deleted.
+    """
+    batch_size = batch_size or getattr(settings, 'ELECTION_RESET_BATCH_SIZE', 5000)
+    _report(state='running', step='archiving results', deleted=0, error=None)
+    archive_elections()
+    deleted = 0
+    for step, queryset in _steps():
+        _report(step=step)
+        while True:
+            with transaction.atomic():
+                pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                # _raw_delete skips the collector: one DELETE ... WHERE pk IN (...)
+                deleted += queryset.model.objects.filter(pk__in=pks)._raw_delete(connection.alias)
+            _report(deleted=deleted)
+    invalidate_election_cache()
+    bump_catalog_version()
+    _report(state='done', step=None)
+    return deleted
+
+
+def _reset_in_background(batch_size):
+    try:
+        reset_election(batch_size)
+    except Exception as error:
+        _report(state='failed', error=str(error))
+        raise
+    finally:
+        connection.close()
+
+
+def start_reset(batch_size=None):
+    """runs reset_election on a background thread, or right away when
+    ELECTION_RESET_IN_BACKGROUND is off. False if a reset is already running
+    """
+    if not cache.add(PROGRESS_KEY + '-lock', True, getattr(settings, 'ELECTION_RESET_LOCK_SECONDS', 3600)):
+        return False
+    _report(state='queued', step=None, deleted=0, error=None)
+    if not getattr(settings, 'ELECTION_RESET_IN_BACKGROUND', True):
+        try:
+            reset_election(batch_size)
+        finally:
+            cache.delete(PROGRESS_KEY + '-lock')
+        return True
+
+    def run():
+        try:
+            _reset_in_background(batch_size)
+        finally:
+            cache.delete(PROGRESS_KEY + '-lock')
+
+    threading.Thread(target=run, name='election-reset', daemon=True).start()
+    return True
@@ -0,0 +1,81 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from datetime import timedelta
+
+from main.models import Candidate, User, ResultSnapshot, catalog_version
+
+
+def compute_standings(election):
+    """every position's standings, from one grouped query over the candidates
+
+    Each position gets its total, its candidates ranked by tally (ties share
+    a rank) with their share of the vote, the winner (None on a tie for
+    first) and the winning margin.
+    """
+    rows = (
+        Candidate.objects.with_tallies()
+        .filter(election=election)
+        .order_by('post_id', '-tally', 'name')
+        .values_list('post_id', 'post__name', 'name', 'tally')
+    )
+    standings = []
+    for (post_id, post_name), candidates in groupby(rows, key=lambda row: row[:2]):
+        candidates = [{'name': name, 'votes': tally} for _, _, name, tally in candidates]
+        total = sum(candidate['votes'] for candidate in candidates)
+        previous, rank = None, 0
+        for place, candidate in enumerate(candidates, 1):
+            if candidate['votes'] != previous:
+                rank, previous = place, candidate['votes']
+            candidate['rank'] = rank
+            candidate['share'] = round(100 * candidate['votes'] / total, 1) if total else 0
+        runner_up = candidates[1]['votes'] if len(candidates) > 1 else 0
+        margin = candidates[0]['votes'] - runner_up
+        standings.append({
+            'position': post_name,
+            'total': total,
+            'candidates': candidates,
+            'winner': candidates[0]['name'] if margin and candidates[0]['votes'] else None,
+            'margin': margin,
+        })
+    return standings
+
+
+def take_snapshot(election):
+    """recomputes the election's standings and turnout and stores them"""
+    turnout = User.objects.filter(is_staff=False, is_superuser=False).aggregate(
+        registered=Count('pk'),
+        voted=Count('pk', filter=Q(hasVoted=True)),
+    )
+    snapshot, _ = ResultSnapshot.objects.update_or_create(election=election, defaults={
+        'standings': compute_standings(election),
+        'registered': turnout['registered'],
+        'voted': turnout['voted'],
+        'catalog_version': catalog_version(),
+        'computed_at': timezone.now(),
+    })
+    return snapshot
+
+
+def is_stale(snapshot, election):
+    """a snapshot is kept for RESULTS_SNAPSHOT_SECONDS, and for good once taken after the election ended"""
+    if snapshot.catalog_version != catalog_version():
+        return True
+    if snapshot.computed_at >= election.end:
+        return False
+    max_age = timedelta(seconds=getattr(settings, 'RESULTS_SNAPSHOT_SECONDS', 60))
+    return timezone.now() - snapshot.computed_at > max_age
+
+
+def election_results(election):
+    """the election's ResultSnapshot, taking a fresh one only when the stored one is stale"""
+    try:
+        snapshot = election.results
+    except ResultSnapshot.DoesNotExist:
+        return take_snapshot(election)
+    if is_stale(snapshot, election):
+        return take_snapshot(election)
+    return snapshot
@@ -0,0 +1,19 @@
+from django.conf import settings
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    """applies SQLITE_JOURNAL_MODE and SQLITE_SYNCHRONOUS to every new SQLite connection
+
+    In WAL mode readers no longer block the writer, and synchronous=NORMAL
+    only syncs at checkpoints; a power cut can lose the last few commits
+    but never corrupts the database.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    journal_mode = getattr(settings, 'SQLITE_JOURNAL_MODE', None)
+    synchronous = getattr(settings, 'SQLITE_SYNCHRONOUS', None)
+    with connection.cursor() as cursor:
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
@@ -0,0 +1,101 @@
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+from unittest.mock import patch, AsyncMock
+
+from urllib.parse import urlencode
+
+from datetime import datetime, timedelta
+
+from main.models import Candidate, Position, User, Election
+from main.portal import PortalUnavailable
+
+from faker import Faker
+fake = Faker()
+
+@override_settings(ROOT_URLCONF='voting.async_urls')
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1),
+            started = True
+        )
+        self.position = Position.objects.create(name='PRESIDENT', election=self.election)
+        self.candidate = Candidate.objects.create(name='Ada', level=100, post=self.position, election=self.election)
+        self.position.candidates.add(self.candidate)
+        self.client = AsyncClient()
+
+    def get(self, path):
+        return async_to_sync(self.client.get)(path)
+
+    def post(self, path, data):
+        return async_to_sync(self.client.post)(path, urlencode(data), content_type='application/x-www-form-urlencoded')
+
+    @patch('main.forms.validate_student')
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock, return_value=True)
+    def test_login_awaits_the_portal(self, avalidate_mock, validate_mock):
+        response = self.post(reverse('reg'), {'username': 'MOU1001', 'password': 'secret'})
+        self.assertRedirects(response, reverse('vote'), fetch_redirect_response=False)
+        avalidate_mock.assert_awaited_once_with('MOU1001', 'secret')
+        validate_mock.assert_not_called()
+
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock, return_value=True)
+    def test_admin_cannot_log_in_as_a_voter(self, avalidate_mock):
+        User.objects.create_superuser(username='admin', password='admin')
+        response = self.post(reverse('reg'), {'username': 'admin', 'password': 'secret'})
+        self.assertContains(response, 'No student has that username and password')
+        self.assertEqual(self.get(reverse('manage')).status_code, 302)
+
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock, return_value=False)
+    def test_wrong_password(self, avalidate_mock):
+        response = self.post(reverse('reg'), {'username': 'MOU1001', 'password': 'secret'})
+        self.assertContains(response, 'No student has that username and password')
+
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock, side_effect=PortalUnavailable)
+    def test_portal_busy(self, avalidate_mock):
+        response = self.post(reverse('reg'), {'username': 'MOU1001', 'password': 'secret'})
+        self.assertContains(response, 'The student portal is busy, try again shortly')
+
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock)
+    def test_no_portal_call_without_a_running_election(self, avalidate_mock):
+        Election.objects.filter(pk=self.election.pk).update(started=False)
+        response = self.post(reverse('reg'), {'username': 'MOU1001', 'password': 'secret'})
+        self.assertContains(response, 'No Election is running')
+        avalidate_mock.assert_not_awaited()
+
+    @patch('main.forms.validate_student')
+    @patch('main.async_views.avalidate_student', new_callable=AsyncMock)
+    def test_missing_password_never_blocks_on_the_portal(self, avalidate_mock, validate_mock):
+        response = self.post(reverse('reg'), {'username': 'MOU1001'})
+        self.assertContains(response, 'This field is required')
+        avalidate_mock.assert_not_awaited()
+        validate_mock.assert_not_called()
+
+    def test_ballot_needs_a_login(self):
+        response = self.get(reverse('vote'))
+        self.assertRedirects(response, reverse('reg'), fetch_redirect_response=False)
+
+    def test_ballot(self):
+        user = User.objects.create(username='MOU1001')
+        self.client.force_login(user)
+        response = self.get(reverse('vote'))
+        self.assertContains(response, 'Ada')
+        response = self.post(reverse('vote'), {f'position-{self.position.pk}': self.candidate.pk})
+        self.assertRedirects(response, reverse('thanks'), fetch_redirect_response=False)
+        self.assertEqual(Candidate.objects.with_tallies().get(pk=self.candidate.pk).tally, 1)
+
+    def test_result(self):
+        User.objects.create_superuser(username='admin', password='admin')
+        self.client.login(username='admin', password='admin')
+        response = self.get(reverse('result'))
+        self.assertContains(response, 'PRESIDENT')
+        self.assertContains(response, 'Turnout')
+
+    def test_result_is_for_admins_only(self):
+        response = self.get(reverse('result'))
+        self.assertRedirects(response, reverse('access_code') + '?next=' + reverse('result'), fetch_redirect_response=False)
@@ -0,0 +1,245 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from datetime import datetime, timedelta
+import threading
+
+from main.models import Candidate, Position, User, Election, Ballot, BallotChoice, TallyShard
+from main.ballot import cast_ballot, ballot_choices, AlreadyVoted, rollup_tallies, recount, audit, BallotWriter
+
+from faker import Faker
+fake = Faker()
+
+class TestCastBallot(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        delta = timedelta(days=1)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + delta
+        )
+        self.position1 = Position.objects.create(name=fake.text())
+        self.position2 = Position.objects.create(name=fake.text())
+        self.candidate1 = Candidate.objects.create(
+            name = fake.name(),
+            level = 100,
+            post = self.position1,
+            election = self.election,
+            votes = 3
+        )
+        self.candidate2 = Candidate.objects.create(
+            name = fake.name(),
+            level = 200,
+            post = self.position2,
+            election = self.election,
+            votes = 5
+        )
+        self.user = User.objects.create(username=fake.user_name())
+
+    def tally(self, candidate):
+        return Candidate.objects.with_tallies().get(pk=candidate.pk).tally
+
+    def ballot(self, *candidates):
+        return {candidate.post_id: candidate.pk for candidate in candidates}
+
+    def test_votes_are_counted(self):
+        cast_ballot(self.user, self.ballot(self.candidate1, self.candidate2))
+        self.assertEqual(self.tally(self.candidate1), 4)
+        self.assertEqual(self.tally(self.candidate2), 6)
+
+    def test_user_has_voted(self):
+        cast_ballot(self.user, self.ballot(self.candidate1))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.hasVoted)
+
+    def test_unknown_candidates_are_ignored(self):
+        self.assertEqual(cast_ballot(self.user, {self.position1.pk: self.candidate1.pk, self.position2.pk: 0}), 1)
+
+    def test_candidate_must_stand_for_the_position(self):
+        self.assertEqual(cast_ballot(self.user, {self.position1.pk: self.candidate2.pk}), 0)
+        self.assertEqual(self.tally(self.candidate2), 5)
+
+    def test_candidate_must_stand_in_the_current_election(self):
+        start = datetime.now(timezone.utc)
+        Election.objects.create(name='Next election', start=start, end=start + timedelta(days=1))
+        self.assertEqual(cast_ballot(self.user, self.ballot(self.candidate1)), 0)
+        self.assertEqual(self.tally(self.candidate1), 3)
+
+    def test_ballot_choices_from_the_form(self):
+        data = {
+            'csrfmiddlewaretoken': 'token',
+            f'position-{self.position1.pk}': str(self.candidate1.pk),
+            'position-junk': '1',
+            'position-7': 'Ada',
+            'some_data': 'some_value',
+        }
+        self.assertEqual(ballot_choices(data), {self.position1.pk: self.candidate1.pk})
+
+    def test_ballot_costs_the_same_however_big(self):
+        cast_ballot(User.objects.create(username=fake.user_name()), self.ballot(self.candidate1, self.candidate2))
+        other = User.objects.create(username=fake.user_name())
+        with self.settings(VOTE_TALLY_SHARDS=1):
+            with CaptureQueriesContext(connection) as one:
+                cast_ballot(self.user, self.ballot(self.candidate1))
+            with CaptureQueriesContext(connection) as two:
+                cast_ballot(other, self.ballot(self.candidate1, self.candidate2))
+        self.assertEqual(len(one), len(two))
+
+    def test_ballot_is_appended_to_the_ledger(self):
+        cast_ballot(self.user, self.ballot(self.candidate1, self.candidate2))
+        ballot = Ballot.objects.get()
+        self.assertEqual(ballot.election, self.election)
+        self.assertEqual(
+            set(ballot.choices.values_list('candidate', 'position')),
+            {(self.candidate1.pk, self.position1.pk), (self.candidate2.pk, self.position2.pk)}
+        )
+
+    def test_ballots_can_not_be_changed(self):
+        cast_ballot(self.user, self.ballot(self.candidate1))
+        with self.assertRaises(ValueError):
+            Ballot.objects.get().save()
+
+    def test_votes_are_spread_over_shards(self):
+        with self.settings(VOTE_TALLY_SHARDS=4):
+            cast_ballot(self.user, self.ballot(self.candidate1))
+        self.assertEqual(TallyShard.objects.filter(candidate=self.candidate1).count(), 4)
+        self.assertEqual(sum(TallyShard.objects.values_list('votes', flat=True)), 1)
+
+    def test_ballot_query_count(self):
+        cast_ballot(User.objects.create(username=fake.user_name()), self.ballot(self.candidate1, self.candidate2))
+        with self.settings(VOTE_TALLY_SHARDS=1):
+            with self.assertNumQueries(9):
+                cast_ballot(self.user, self.ballot(self.candidate1, self.candidate2))
+
+    def test_second_ballot_is_rejected(self):
+        cast_ballot(self.user, self.ballot(self.candidate1))
+        stale_user = User.objects.get(pk=self.user.pk)
+        stale_user.hasVoted = False
+        with self.assertRaises(AlreadyVoted):
+            cast_ballot(stale_user, self.ballot(self.candidate1))
+        self.assertEqual(self.tally(self.candidate1), 4)
+        self.assertEqual(Ballot.objects.count(), 1)
+
+    def test_rollup_moves_shards_into_votes(self):
+        cast_ballot(self.user, self.ballot(self.candidate1, self.candidate2))
+        self.assertEqual(rollup_tallies(), 2)
+        self.candidate1.refresh_from_db()
+        self.assertEqual(self.candidate1.votes, 4)
+        self.assertEqual(self.tally(self.candidate1), 4)
+        self.assertFalse(TallyShard.objects.filter(votes__gt=0).exists())
+
+    def test_recount_from_ledger(self):
+        cast_ballot(self.user, self.ballot(self.candidate1))
+        cast_ballot(User.objects.create(username=fake.user_name()), self.ballot(self.candidate1, self.candidate2))
+        self.assertEqual(recount(self.election), {self.candidate1.pk: 2, self.candidate2.pk: 1})
+
+    def test_audit_reports_votes_missing_from_the_ledger(self):
+        Candidate.objects.filter(pk=self.candidate2.pk).update(votes=0)
+        Candidate.objects.filter(pk=self.candidate1.pk).update(votes=0)
+        cast_ballot(self.user, self.ballot(self.candidate1))
+        self.assertEqual(audit(self.election), {})
+        BallotChoice.objects.all().delete()
+        self.assertEqual(audit(self.election), {self.candidate1: (1, 0)})
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TestConcurrentBallots(TransactionTestCase):
+    """the vote path's locking, checked with real concurrent connections (PostgreSQL, see tox.ini)"""
+
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+        position = Position.objects.create(name='PRESIDENT', election=self.election)
+        self.candidate = Candidate.objects.create(name='Ada', level=100, post=position, election=self.election)
+
+    def run_together(self, *targets):
+        barrier = threading.Barrier(len(targets))
+        errors = []
+
+        def run(target):
+            try:
+                barrier.wait()
+                target()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_one_ballot_per_voter(self):
+        user = User.objects.create(username='MOU1001')
+        submissions = [User.objects.get(pk=user.pk) for _ in range(8)]
+        errors = self.run_together(*(lambda voter=voter: cast_ballot(voter, {self.candidate.post_id: self.candidate.pk}) for voter in submissions))
+        self.assertEqual(len(errors), 7)
+        self.assertTrue(all(isinstance(error, AlreadyVoted) for error in errors))
+        self.assertEqual(Ballot.objects.count(), 1)
+        self.assertEqual(Candidate.objects.with_tallies().get().tally, 1)
+
+    def test_no_vote_is_lost(self):
+        voters = [User.objects.create(username=f"MOU{idx}") for idx in range(20)]
+        errors = self.run_together(
+            rollup_tallies,
+            *(lambda voter=voter: cast_ballot(voter, {self.candidate.post_id: self.candidate.pk}) for voter in voters),
+        )
+        self.assertEqual(errors, [])
+        self.assertEqual(Candidate.objects.with_tallies().get().tally, 20)
+        self.assertEqual(audit(self.election), {})
+
+
+class TestBallotWriter(TransactionTestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+        position = Position.objects.create(name='PRESIDENT', election=self.election)
+        self.candidate = Candidate.objects.create(name='Ada', level=100, post=position, election=self.election)
+        self.writer = BallotWriter(batch_size=50, linger=0.05)
+
+    def submit_together(self, voters):
+        errors = []
+
+        def submit(voter):
+            try:
+                self.writer.submit(voter, {self.candidate.post_id: self.candidate.pk})
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=submit, args=(voter,)) for voter in voters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_ballots_are_committed_in_batches(self):
+        voters = [User.objects.create(username=f"MOU{idx}") for idx in range(20)]
+        self.assertEqual(self.submit_together(voters), [])
+        self.assertEqual(Candidate.objects.with_tallies().get().tally, 20)
+        self.assertEqual(User.objects.filter(hasVoted=True).count(), 20)
+        self.assertLess(self.writer.batches, 20)
+
+    def test_rejected_ballot_does_not_undo_the_batch(self):
+        voter = User.objects.create(username='MOU1001')
+        voters = [voter, User.objects.get(pk=voter.pk), User.objects.create(username='MOU1002')]
+        errors = self.submit_together(voters)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], AlreadyVoted)
+        self.assertEqual(Ballot.objects.count(), 2)
+        self.assertEqual(Candidate.objects.with_tallies().get().tally, 2)
+
+
+class TestSQLiteTuning(TestCase):
+    def test_synchronous_normal(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
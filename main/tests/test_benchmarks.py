@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase, TestCase
+
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+from main.benchmarks import PATHS, bench_paths, load_baseline, save_baseline, regressions
+from main.models import Election, Candidate, User
+
+
+def result(name, seconds, operations=10):
+    return {'name': name, 'operations': operations, 'seconds': seconds, 'per_second': operations / seconds}
+
+
+class TestBaseline(SimpleTestCase):
+    def test_missing_baseline_is_empty(self):
+        with TemporaryDirectory() as tmp:
+            self.assertEqual(load_baseline(Path(tmp) / 'baseline.json'), {})
+
+    def test_saved_per_operation_and_merged(self):
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'baseline.json'
+            save_baseline(path, [result('paths.ballot.10x5', 1.0), result('paths.refresh.10x5', 0.1)])
+            save_baseline(path, [result('paths.ballot.10x5', 2.0)])
+            self.assertEqual(load_baseline(path), {'paths.ballot.10x5': 0.2, 'paths.refresh.10x5': 0.01})
+
+    def test_regressions_beyond_the_tolerance(self):
+        baseline = {'fast': 0.1, 'steady': 0.1, 'slow': 0.1}
+        results = [result('fast', 0.5), result('steady', 1.2), result('slow', 1.3), result('new', 9.0)]
+        self.assertEqual(regressions(results, baseline, 0.25), [('slow', 0.1, 0.13)])
+
+
+class TestBenchPaths(TestCase):
+    def test_every_path_at_every_scale_leaves_nothing_behind(self):
+        results = bench_paths(n=3, scales=[(2, 1), (3, 2)], rounds=1)
+        names = [result['name'] for result in results]
+        self.assertEqual(names[0], 'paths.format_name')
+        self.assertEqual(
+            names[1:],
+            [f"paths.{label}.{scale}" for scale in ('2x1', '3x2') for label in PATHS]
+        )
+        self.assertFalse(Election.objects.exists())
+        self.assertFalse(Candidate.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith='bench').exists())
@@ -6,7 +6,8 @@ from unittest.mock import patch, Mock
 
 from datetime import datetime, timedelta
 
-from main.models import User, Candidate, Position, Election
+from main.models import User, Candidate, Position, Election, EligibleVoter
+from main.portal_stub import PortalStub
 from main.forms import (
     RegForm,
     validate_student,
@@ -37,35 +38,45 @@ class TestRegForm(TestCase):
         }
         self.form = RegForm(data=self.data)
 
-    @patch('main.forms.requests.post')
-    def test_form_is_valid(self, response_mock):
-        response_mock_url = 'https://mouauportal.edu.ng/my-account-student.php'
-        response_mock.return_value.url = response_mock_url 
+    @patch('main.forms.validate_student', return_value=True)
+    def test_form_is_valid(self, validate_mock):
         print(self.form.errors)
         self.assertTrue(self.form.is_valid())
 
-    @patch('main.forms.requests.post')
-    def test_validation_error_for_invalid_username_and_password(self, response_mock):
-        response_mock_url = 'https://mouauportal.edu.ng/login.php'
-        response_mock.return_value.url = response_mock_url
+    @patch('main.forms.validate_student', return_value=False)
+    def test_validation_error_for_invalid_username_and_password(self, validate_mock):
         response = Client().post(reverse("reg"), data=self.data)
         self.assertFormError(response, "form", None, errors="Invalid username and password")
 
-    @patch('main.forms.requests.post')
-    def test_validate_student_returns_true(self, response_mock):
-        response_mock_url = 'https://mouauportal.edu.ng/my-account-student.php'
-        response_mock.return_value.url = response_mock_url
-        self.assertTrue(validate_student(fake.user_name(), fake.password()))
+    def test_validate_student_returns_true(self):
+        username, password = fake.user_name(), fake.password()
+        with PortalStub({username: password}) as portal, self.settings(STUDENT_PORTAL_URL=portal.url):
+            self.assertTrue(validate_student(username, password))
 
-    @patch('main.forms.requests.post')
-    def test_validate_student_returns_false(self, response_mock):
-        response_mock_url = 'https://mouauportal.edu.ng/login.php'
-        response_mock.return_value.url = response_mock_url
-        self.assertFalse(validate_student(fake.user_name(), fake.password()))
+    def test_validate_student_returns_false(self):
+        with PortalStub({fake.user_name(): fake.password()}) as portal, self.settings(STUDENT_PORTAL_URL=portal.url):
+            self.assertFalse(validate_student(fake.user_name(), fake.password()))
 
     def test_validate_student_returns_None_on_connectionError(self):
         self.assertEqual(validate_student(fake.user_name(), fake.password()), None)
 
+    def test_validate_student_against_voter_roll(self):
+        EligibleVoter.objects.create(student_id='MOU1001', credential=EligibleVoter.make_credential('MOU1001', 'token'))
+        with self.settings(STUDENT_VERIFICATION='roll'):
+            with self.assertNumQueries(1):
+                self.assertTrue(validate_student('MOU1001', 'token'))
+            self.assertFalse(validate_student('MOU1001', 'wrong'))
+            self.assertFalse(validate_student('MOU1002', 'token'))
+
+    @patch('main.forms.portal_client')
+    def test_students_missing_from_the_roll_go_to_the_portal(self, client_mock):
+        client_mock.return_value.verify.return_value = True
+        EligibleVoter.objects.create(student_id='MOU1001', credential=EligibleVoter.make_credential('MOU1001', 'token'))
+        with self.settings(STUDENT_VERIFICATION='roll_then_portal'):
+            self.assertFalse(validate_student('MOU1001', 'wrong'))
+            self.assertTrue(validate_student('MOU1002', 'token'))
+        client_mock.return_value.verify.assert_called_once_with('MOU1002', 'token')
+
     def test_Election_is_not_running_validationError(self):
         Election.objects.all().delete()
         response = Client().post(reverse("reg"), data=self.data)
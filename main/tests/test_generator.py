@@ -0,0 +1,69 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from io import StringIO
+
+from main.generator import generate_election
+from main.models import Election, Position, Candidate, User, Ballot, BallotChoice
+
+
+class TestGenerateElection(TestCase):
+    def test_counts(self):
+        election, cast = generate_election(positions=3, candidates=4, voters=50, turnout=0.5, batch_size=7)
+        self.assertEqual(cast, 25)
+        self.assertEqual(election.positions.count(), 3)
+        self.assertEqual(election.candidates.count(), 12)
+        self.assertEqual(User.objects.filter(username__startswith='MOU').count(), 50)
+        self.assertEqual(User.objects.filter(hasVoted=True).count(), 25)
+        self.assertEqual(election.ballots.count(), 25)
+
+    def test_every_ballot_picks_one_candidate_per_position(self):
+        election, _ = generate_election(positions=3, candidates=2, voters=20, turnout=1)
+        per_ballot = BallotChoice.objects.values('ballot').annotate(picks=Count('pk'), positions=Count('position', distinct=True))
+        self.assertEqual({(row['picks'], row['positions']) for row in per_ballot}, {(3, 3)})
+        for choice in BallotChoice.objects.select_related('candidate'):
+            self.assertEqual(choice.candidate.post_id, choice.position_id)
+
+    def test_votes_match_the_ballots(self):
+        election, _ = generate_election(positions=2, candidates=3, voters=40, turnout=0.75)
+        for candidate in election.candidates.annotate(picked=Count('choices')):
+            self.assertEqual(candidate.votes, candidate.picked)
+        self.assertEqual(election.candidates.aggregate(total=Sum('votes'))['total'], 60)
+
+    def test_candidates_are_on_the_ballot(self):
+        election, _ = generate_election(positions=2, candidates=3, voters=0)
+        for position in election.positions.all():
+            self.assertEqual(position.candidates.count(), 3)
+
+    def test_names_do_not_clash(self):
+        generate_election(positions=4, candidates=3, voters=0, seed=1, prefix='A')
+        generate_election(positions=4, candidates=3, voters=0, seed=1, prefix='B')
+        self.assertEqual(Position.objects.count(), 8)
+        self.assertEqual(Candidate.objects.values('name').distinct().count(), 24)
+
+    def test_states(self):
+        upcoming, _ = generate_election(voters=0, state='upcoming')
+        self.assertFalse(upcoming.started)
+        ended, _ = generate_election(voters=0, state='ended', prefix='X')
+        self.assertTrue(ended.started and ended.ended)
+        self.assertLess(ended.end, upcoming.start)
+
+    def test_existing_voters_are_refused(self):
+        User.objects.create_user(username='MOU000000')
+        with self.assertRaises(ValueError):
+            generate_election(voters=1)
+        self.assertFalse(Election.objects.exists())
+
+
+class TestGenerateElectionCommand(TestCase):
+    def test_generates(self):
+        out = StringIO()
+        call_command('generate_election', positions=2, candidates=2, voters=10, turnout=0.5, seed=3, stdout=out)
+        self.assertIn("2 positions, 4 candidates, 10 voters and 5 ballots", out.getvalue())
+        self.assertEqual(Ballot.objects.count(), 5)
+
+    def test_bad_turnout(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_election', turnout=2, stdout=StringIO())
@@ -0,0 +1,132 @@
+from django.test import TestCase, Client
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from datetime import datetime, timedelta
+from io import StringIO
+import json
+import tempfile
+
+from main.models import EligibleVoter, Election, Position, Candidate, User
+from main.importers import read_rows, import_voter_roll, import_ballot
+
+from faker import Faker
+fake = Faker()
+
+class TestImportVoterRoll(TestCase):
+    def setUp(self):
+        self.rows = [
+            {'student_id': 'MOU1001', 'token': 'alpha'},
+            {'student_id': 'MOU1002', 'credential': make_password('beta')},
+        ]
+
+    def test_students_are_added(self):
+        self.assertEqual(import_voter_roll(self.rows), 2)
+        self.assertTrue(EligibleVoter.objects.get(student_id='MOU1001').check_credential('alpha'))
+        self.assertTrue(EligibleVoter.objects.get(student_id='MOU1002').check_credential('beta'))
+
+    def test_tokens_are_not_stored(self):
+        import_voter_roll(self.rows)
+        self.assertNotIn('alpha', EligibleVoter.objects.get(student_id='MOU1001').credential)
+
+    def test_wrong_token(self):
+        import_voter_roll(self.rows)
+        self.assertFalse(EligibleVoter.objects.get(student_id='MOU1001').check_credential('beta'))
+
+    def test_existing_students_are_kept(self):
+        import_voter_roll(self.rows)
+        self.assertEqual(import_voter_roll([{'student_id': 'MOU1001', 'token': 'other'}]), 0)
+        self.assertTrue(EligibleVoter.objects.get(student_id='MOU1001').check_credential('alpha'))
+
+    def test_replace(self):
+        import_voter_roll(self.rows)
+        import_voter_roll([{'student_id': 'MOU1003', 'token': 'gamma'}], replace=True)
+        self.assertEqual(list(EligibleVoter.objects.values_list('student_id', flat=True)), ['MOU1003'])
+
+    def test_row_without_secret(self):
+        with self.assertRaises(ValueError):
+            import_voter_roll([{'student_id': 'MOU1001'}])
+
+    def test_command_reads_csv_and_json(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as roll:
+            roll.write("student_id,token\nMOU2001,one\nMOU2002,two\n")
+            roll.flush()
+            self.assertEqual(len(read_rows(roll.name)), 2)
+            call_command('import_voter_roll', roll.name, stdout=StringIO())
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as roll:
+            json.dump([{'student_id': 'MOU2003', 'token': 'three'}], roll)
+            roll.flush()
+            call_command('import_voter_roll', roll.name, stdout=StringIO())
+        self.assertEqual(EligibleVoter.objects.count(), 3)
+
+
+class TestImportBallot(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        self.election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+        self.rows = [
+            {'position': 'president', 'candidate': 'ada LOVELACE', 'level': '300'},
+            {'position': 'President', 'candidate': 'bola tinubu', 'level': 400},
+            {'position': 'secretary', 'candidate': '', 'level': ''},
+        ]
+
+    def test_positions_and_candidates_are_added(self):
+        self.assertEqual(import_ballot(self.rows), (2, 2))
+        president = Position.objects.get(name='PRESIDENT')
+        self.assertEqual(president.election, self.election)
+        self.assertEqual(set(president.candidates.values_list('name', flat=True)), {'Ada Lovelace', 'Bola Tinubu'})
+        self.assertEqual(Candidate.objects.get(name='Ada Lovelace').post, president)
+        self.assertTrue(Position.objects.filter(name='SECRETARY').exists())
+
+    def test_existing_entries_are_kept(self):
+        import_ballot(self.rows)
+        self.assertEqual(import_ballot(self.rows + [{'position': 'treasurer', 'candidate': 'chidi', 'level': 100}]), (1, 1))
+        self.assertEqual(Candidate.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_the_file(self):
+        rows = [{'position': f'position {idx}', 'candidate': f'candidate {idx}', 'level': 100} for idx in range(40)]
+        with CaptureQueriesContext(connection) as small:
+            import_ballot(rows[:2])
+        with CaptureQueriesContext(connection) as large:
+            import_ballot(rows[2:])
+        self.assertEqual(len(small), len(large))
+
+    def test_bad_level(self):
+        with self.assertRaises(ValueError):
+            import_ballot([{'position': 'president', 'candidate': 'ada', 'level': '250'}])
+        self.assertFalse(Position.objects.exists())
+
+    def test_needs_an_election_being_set_up(self):
+        Election.objects.update(started=True)
+        with self.assertRaises(ValueError):
+            import_ballot(self.rows)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as ballot:
+            ballot.write("position,candidate,level\npresident,ada,100\npresident,bola,200\n")
+            ballot.flush()
+            out = StringIO()
+            call_command('import_ballot', ballot.name, stdout=out)
+        self.assertIn('Added 1 positions and 2 candidates from 2 rows', out.getvalue())
+
+    def test_upload(self):
+        User.objects.create_user(username='staff', password='staff', is_staff=True)
+        client = Client()
+        client.login(username='staff', password='staff')
+        upload = SimpleUploadedFile('ballot.json', json.dumps(self.rows).encode('utf-8'))
+        response = client.post(reverse('import_ballot'), {'file': upload})
+        self.assertRedirects(response, reverse('list'))
+        self.assertEqual(Candidate.objects.count(), 2)
+
+    def test_upload_must_be_csv_or_json(self):
+        User.objects.create_user(username='staff', password='staff', is_staff=True)
+        client = Client()
+        client.login(username='staff', password='staff')
+        upload = SimpleUploadedFile('ballot.txt', b"president,ada,100")
+        response = client.post(reverse('import_ballot'), {'file': upload})
+        self.assertContains(response, 'Upload a .csv or .json file')
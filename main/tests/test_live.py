@@ -0,0 +1,127 @@
+from django.test import SimpleTestCase, TestCase, Client
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+from unittest.mock import patch
+
+from datetime import datetime, timedelta
+import asyncio
+import json
+
+from main.models import Candidate, Position, User, Election
+from main.live import ResultsBroadcaster, live_standings, results_stream, _is_admin
+
+from faker import Faker
+fake = Faker()
+
+
+def decode(message):
+    event, data = message.decode('utf-8').strip().split('\n')
+    return event[len('event: '):], json.loads(data[len('data: '):])
+
+
+class TestResultsBroadcaster(SimpleTestCase):
+    def setUp(self):
+        self.standings = {'PRESIDENT': {'Ada': 1, 'Bola': 0}}
+        patcher = patch('main.live.live_standings', side_effect=lambda: json.loads(json.dumps(self.standings)))
+        self.standings_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_many_dashboards_cost_one_aggregation(self):
+        broadcaster = ResultsBroadcaster(interval=0.01, poll=60)
+
+        async def watch():
+            queues = [broadcaster.subscribe() for _ in range(200)]
+            messages = [await queue.get() for queue in queues]
+            for queue in queues:
+                broadcaster.unsubscribe(queue)
+            return messages
+
+        messages = async_to_sync(watch)()
+        self.assertEqual(broadcaster.aggregations, 1)
+        self.assertEqual(len(set(messages)), 1)
+        self.assertEqual(decode(messages[0]), ('standings', self.standings))
+
+    def test_ballots_are_coalesced_into_one_delta(self):
+        broadcaster = ResultsBroadcaster(interval=0.05, poll=60)
+
+        async def watch():
+            queue = broadcaster.subscribe()
+            first = await queue.get()
+            self.standings['PRESIDENT']['Bola'] = 3
+            for _ in range(3):
+                broadcaster.notify()
+            second = await queue.get()
+            broadcaster.unsubscribe(queue)
+            return first, second
+
+        first, second = async_to_sync(watch)()
+        self.assertEqual(decode(first)[0], 'standings')
+        self.assertEqual(decode(second), ('delta', {'PRESIDENT': {'Bola': 3}}))
+        self.assertEqual(broadcaster.aggregations, 2)
+
+    def test_new_candidate_sends_full_standings(self):
+        broadcaster = ResultsBroadcaster(interval=0.01, poll=60)
+
+        async def watch():
+            queue = broadcaster.subscribe()
+            await queue.get()
+            self.standings['PRESIDENT']['Chidi'] = 0
+            broadcaster.notify()
+            message = await queue.get()
+            broadcaster.unsubscribe(queue)
+            return message
+
+        self.assertEqual(decode(async_to_sync(watch)()), ('standings', self.standings))
+
+    @patch('main.live._is_admin', return_value=True)
+    def test_stream(self, admin_mock):
+        sent = []
+
+        async def stream():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if message.get('more_body'):
+                    disconnect.set()
+
+            await results_stream({'type': 'http', 'headers': []}, receive, send)
+
+        async_to_sync(stream)()
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertEqual(decode(sent[1]['body']), ('standings', self.standings))
+
+    @patch('main.live._is_admin', return_value=False)
+    def test_stream_is_for_admins_only(self, admin_mock):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async_to_sync(results_stream)({'type': 'http', 'headers': []}, None, send)
+        self.assertEqual(sent[0]['status'], 403)
+
+
+class TestLiveStandings(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+        position = Position.objects.create(name='PRESIDENT', election=election)
+        Candidate.objects.create(name='Ada', level=100, post=position, election=election, votes=4)
+        User.objects.create_superuser(username='admin', password='admin')
+
+    def test_standings(self):
+        self.assertEqual(live_standings(), {'PRESIDENT': {'Ada': 4}})
+
+    def test_only_admins_may_watch(self):
+        client = Client()
+        self.assertFalse(_is_admin({'headers': []}))
+        client.login(username='admin', password='admin')
+        cookie = f"sessionid={client.cookies['sessionid'].value}".encode('latin-1')
+        self.assertTrue(_is_admin({'headers': [(b'cookie', cookie)]}))
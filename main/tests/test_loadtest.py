@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from main.benchmarks import build_election
+from main.models import Election, User, Ballot, BallotChoice
+from main.loadtest import LoadStats, voter, run_load_test, percentile
+from main.portal_stub import PortalStub
+
+
+class TestPercentile(SimpleTestCase):
+    def test_percentiles(self):
+        latencies = [idx / 100 for idx in range(1, 101)]
+        self.assertEqual(percentile(latencies, 0.5), 0.51)
+        self.assertEqual(percentile(latencies, 0.99), 1.0)
+        self.assertEqual(percentile([0.2], 0.95), 0.2)
+
+
+class TestVoter(TestCase):
+    def setUp(self):
+        build_election(positions=2, candidates=2, voters=0)
+        self.stats = LoadStats()
+
+    def test_votes_like_a_student(self):
+        with PortalStub({'MOU1001': 'secret'}, latency=0) as portal, \
+                self.settings(STUDENT_PORTAL_URL=portal.url, STUDENT_VERIFICATION='portal'):
+            self.assertTrue(voter(self.stats, 'MOU1001', 'secret'))
+        self.assertEqual(BallotChoice.objects.count(), 2)
+        self.assertTrue(User.objects.get(username='MOU1001').hasVoted)
+        self.assertEqual(sorted(self.stats.latencies), ['GET /reg/', 'GET /thanks/', 'GET /vote/', 'POST /reg/', 'POST /vote/'])
+        self.assertFalse(any(self.stats.errors.values()))
+
+    def test_portal_errors_are_counted(self):
+        with PortalStub({'MOU1001': 'secret'}, latency=0, error_rate=1) as portal, \
+                self.settings(STUDENT_PORTAL_URL=portal.url, STUDENT_VERIFICATION='portal'):
+            self.assertFalse(voter(self.stats, 'MOU1001', 'secret'))
+        self.assertEqual(self.stats.errors['POST /reg/'], 1)
+        self.assertNotIn('GET /vote/', self.stats.latencies)
+
+
+class TestRunLoadTest(TransactionTestCase):
+    def test_election_day(self):
+        result = run_load_test(voters=4, concurrency=2, positions=1, candidates=2, latency=0)
+        endpoints = {row['name']: row for row in result['endpoints']}
+        self.assertEqual(endpoints['GET /reg/']['requests'], 4)
+        # the in-memory test database locks whole tables, so only check the books balance
+        votes = endpoints.get('POST /vote/', {'requests': 0, 'errors': 0})
+        self.assertEqual(result['ballots'], votes['requests'] - votes['errors'])
+        self.assertFalse(Election.objects.exists())
+        self.assertFalse(Ballot.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith='load').exists())
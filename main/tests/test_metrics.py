@@ -0,0 +1,112 @@
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+from unittest.mock import patch
+
+from datetime import datetime, timedelta
+import re
+import threading
+import time
+
+from main.models import Election, User, invalidate_election_cache
+from main.metrics import BUCKETS, COUNT, QUERIES, PORTAL_SECONDS, collect, reset_metrics, portal_timer, render_metrics
+
+
+def sample(text, name):
+    """{labels: value} of one metric in the exposition text"""
+    return {
+        labels: float(value)
+        for labels, value in re.findall(rf'^{name}\{{(.*)\}} (\S+)$', text, re.MULTILINE)
+    }
+
+
+class TestMetricsMiddleware(TestCase):
+    def setUp(self):
+        reset_metrics()
+        invalidate_election_cache()
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.get(reverse('reg'))
+        self.client.get(reverse('reg'))
+        self.client.get(reverse('thanks'))
+        views, statuses = collect()
+        self.assertEqual(views['reg'][COUNT], 2)
+        self.assertEqual(views['thanks'][COUNT], 1)
+        self.assertEqual(statuses[('reg', 200)], 2)
+
+    def test_queries_are_counted(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('reg'))
+        self.assertEqual(collect()[0]['reg'][QUERIES], 1)
+
+    def test_unknown_urls(self):
+        self.client.get('/nowhere/')
+        self.assertEqual(collect()[1][('unmatched', 404)], 1)
+
+    def test_portal_time(self):
+        start = datetime.now(timezone.utc)
+        Election.objects.create(name='An election', start=start, end=start + timedelta(days=1), started=True)
+
+        def slow_portal(username, password):
+            time.sleep(0.05)
+            return False
+
+        with patch('main.forms.portal_client') as client_mock:
+            client_mock.return_value.verify.side_effect = slow_portal
+            self.client.post(reverse('reg'), {'username': 'MOU1001', 'password': 'secret'})
+        self.assertGreaterEqual(collect()[0]['reg'][PORTAL_SECONDS], 0.05)
+
+    def test_no_request_no_portal_time(self):
+        with portal_timer():
+            pass
+        self.assertFalse(collect()[0])
+
+    def test_threads_are_summed(self):
+        worker = threading.Thread(target=self.client.get, args=(reverse('thanks'),))
+        worker.start()
+        worker.join()
+        self.client.get(reverse('thanks'))
+        self.assertEqual(collect()[0]['thanks'][COUNT], 2)
+
+    @override_settings(ROOT_URLCONF='voting.async_urls')
+    def test_async_views(self):
+        async_to_sync(AsyncClient().get)(reverse('reg'))
+        views = collect()[0]
+        self.assertEqual(views['reg'][COUNT], 1)
+        # the queries ran on the sync thread
+        self.assertGreater(views['reg'][QUERIES], 0)
+
+
+class TestMetricsView(TestCase):
+    def setUp(self):
+        reset_metrics()
+
+    def test_staff_only(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertRedirects(response, reverse('access_code') + '?next=' + reverse('metrics'), fetch_redirect_response=False)
+
+    def test_prometheus_text(self):
+        self.client.force_login(User.objects.create_user(username='staff', password='staff', is_staff=True))
+        self.client.get(reverse('thanks'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode('utf-8')
+        buckets = sample(text, 'voting_request_seconds_bucket')
+        self.assertEqual(buckets['view="thanks",le="+Inf"'], 1)
+        self.assertEqual(len([labels for labels in buckets if labels.startswith('view="thanks"')]), len(BUCKETS) + 1)
+        self.assertEqual(sample(text, 'voting_responses_total')['view="thanks",status="200"'], 1)
+        self.assertEqual(sample(text, 'voting_portal_circuit_state')['state="closed"'], 1)
+        self.assertRegex(text, r'(?m)^voting_portal_calls_total \d+$')
+
+    def test_histogram_is_cumulative(self):
+        with patch('main.metrics.time.perf_counter', side_effect=[0, 0.03, 10, 10.2, 20, 40]):
+            for _ in range(3):
+                self.client.get(reverse('thanks'))
+        buckets = sample(render_metrics(), 'voting_request_seconds_bucket')
+        self.assertEqual(buckets['view="thanks",le="0.025"'], 0)
+        self.assertEqual(buckets['view="thanks",le="0.05"'], 1)
+        self.assertEqual(buckets['view="thanks",le="0.25"'], 2)
+        self.assertEqual(buckets['view="thanks",le="10"'], 2)
+        self.assertEqual(buckets['view="thanks",le="+Inf"'], 3)
@@ -2,7 +2,7 @@ from django.test import TestCase, Client, override_settings
 from django.views.generic.base import View
 from django.urls import reverse, path
 
-from main.models import User 
+from main.models import User, forget_access_accounts
 from main.mixins import UserRequiredMixin, StaffRequiredMixin, AdminRequiredMixin
 from main.views import RegFormView, AccessCodeView
 
@@ -49,7 +49,7 @@ class TestUserRequiredMixin(TestCase):
 @override_settings(ROOT_URLCONF=__name__)
 class TestStaffRequiredMixin(TestCase):
     def setUp(self):
-        pass
+        forget_access_accounts()
         
     def test_staff_is_avaliable(self):
         Client().get(reverse('staff'))
@@ -90,7 +90,7 @@ class TestStaffRequiredMixin(TestCase):
 @override_settings(ROOT_URLCONF=__name__)
 class TestAdminRequiredMixin(TestCase):
     def setUp(self):
-        pass
+        forget_access_accounts()
 
     def test_admin_is_avaliable(self):
         Client().get(reverse('admin'))
@@ -119,4 +119,23 @@ class TestAdminRequiredMixin(TestCase):
         client.get(reverse('staff'))
         client.force_login(user=User.objects.get(username='staff'))
         response = client.get(reverse('admin'))
-        self.assertEqual(response.url, '/auth/?next=/admin/')
\ No newline at end of file
+        self.assertEqual(response.url, '/auth/?next=/admin/')
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestAccessAccountsBootstrap(TestCase):
+    def setUp(self):
+        forget_access_accounts()
+
+    def test_accounts_are_created_once(self):
+        client = Client()
+        client.get(reverse('staff'))
+        User.objects.filter(username='staff').delete()
+        client.get(reverse('staff'))
+        self.assertFalse(User.objects.filter(username='staff').exists())
+
+    def test_existing_access_codes_are_kept(self):
+        staff = User.objects.create_user(username='staff', password='changed', is_staff=True)
+        Client().get(reverse('admin'))
+        staff.refresh_from_db()
+        self.assertTrue(staff.check_password('changed'))
+        self.assertTrue(User.objects.get(username='admin').is_superuser)
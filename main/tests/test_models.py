@@ -1,8 +1,9 @@
 from django.test import TestCase 
+from django.db import connection, IntegrityError
 from django.contrib.auth import authenticate
 from django.utils import timezone
 
-from main.models import Candidate, Position, User, Election
+from main.models import Candidate, Position, User, Election, refresh_election_status, invalidate_election_cache
 
 from unittest.mock import patch
 
@@ -134,4 +135,84 @@ class TestElectionModel(TestCase):
         self.assertTrue(self.election.started)
 
     def test_ended_is_set_to_true(self):
-        self.assertTrue(self.election.ended)
\ No newline at end of file
+        self.assertTrue(self.election.ended)
+
+
+class TestRefreshElectionStatus(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        delta = timedelta(days=1)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start - delta,
+            end = start + delta
+        )
+
+    def test_started_is_saved(self):
+        refresh_election_status()
+        self.election.refresh_from_db()
+        self.assertTrue(self.election.started)
+        self.assertFalse(self.election.ended)
+
+    def test_flag_is_written_only_once(self):
+        with self.assertNumQueries(2):
+            refresh_election_status()
+        with self.assertNumQueries(0):
+            election = refresh_election_status()
+        self.assertEqual(election, self.election)
+
+    def test_new_election_clears_the_cache(self):
+        refresh_election_status()
+        start = datetime.now(timezone.utc)
+        election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start + timedelta(days=1),
+            end = start + timedelta(days=2)
+        )
+        self.assertEqual(refresh_election_status(), election)
+        self.assertFalse(election.started)
+
+    def test_no_election(self):
+        Election.objects.all().delete()
+        invalidate_election_cache()
+        self.assertIsNone(refresh_election_status())
+
+
+class TestHotPathIndexes(TestCase):
+    """the hot lookups are answered from an index, checked with EXPLAIN"""
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # the tables are tiny, so make the planner show the index it would use
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+        self.position = Position.objects.create(name='PRESIDENT', election=self.election)
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX|Index (Only )?Scan')
+        self.assertNotRegex(plan, r'SCAN (TABLE )?main_\w+$|Seq Scan')
+        if index:
+            self.assertIn(index, plan)
+
+    def test_running_election(self):
+        self.assertUsesIndex(Election.objects.filter(started=True).filter(ended=False).order_by('-id')[:1], 'election_running_idx')
+
+    def test_election_being_set_up(self):
+        self.assertUsesIndex(Election.objects.filter(started=False).filter(ended=False).order_by('-id')[:1], 'election_upcoming_idx')
+
+    def test_candidates_by_name(self):
+        self.assertUsesIndex(Candidate.objects.filter(name__in=['Ada', 'Bola']))
+
+    def test_candidates_by_election_and_position(self):
+        self.assertUsesIndex(Candidate.objects.filter(election=self.election, post=self.position))
+
+    def test_positions_by_election(self):
+        self.assertUsesIndex(Position.objects.filter(election=self.election))
+
+    def test_candidate_stands_once_per_position(self):
+        Candidate.objects.create(name='Ada', level=100, post=self.position, election=self.election)
+        with self.assertRaises(IntegrityError):
+            Candidate.objects.create(name='Ada', level=100, post=self.position, election=self.election)
@@ -0,0 +1,318 @@
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+from unittest import skipIf
+from unittest.mock import patch
+
+from datetime import datetime, timedelta
+import asyncio
+import threading
+
+from main.models import Election
+from main.forms import validate_student, RegForm
+from main.portal import (
+    PortalClient,
+    AsyncPortalClient,
+    PortalUnavailable,
+    CircuitBreaker,
+    Bulkhead,
+    PortalGuard,
+    LocalVerificationBackend,
+    VerificationCache,
+    verification_cache,
+    httpx,
+)
+from main.portal_stub import PortalStub
+
+from faker import Faker
+fake = Faker()
+
+class TestPortalClient(SimpleTestCase):
+    def setUp(self):
+        self.username = fake.user_name()
+        self.password = fake.password()
+        self.portal = PortalStub({self.username: self.password}).start()
+        self.client = PortalClient(self.portal.url, (1, 1), 2)
+
+    def tearDown(self):
+        self.portal.stop()
+
+    def test_valid_student(self):
+        self.assertTrue(self.client.verify(self.username, self.password))
+
+    def test_wrong_password(self):
+        self.assertFalse(self.client.verify(self.username, fake.password()))
+
+    def test_logins_do_not_share_cookies(self):
+        self.client.verify(self.username, self.password)
+        self.assertFalse(self.client.verify(fake.user_name(), fake.password()))
+
+    def test_connections_are_reused(self):
+        self.client.verify(self.username, self.password)
+        self.client.verify(self.username, self.password)
+        pools = self.client.adapter.poolmanager.pools
+        self.assertEqual([pools[key].num_connections for key in pools.keys()], [1])
+
+    def test_none_when_portal_is_too_slow(self):
+        self.portal.server.latency = 0.3
+        client = PortalClient(self.portal.url, (1, 0.1), 2)
+        self.assertIsNone(client.verify(self.username, self.password))
+
+    def test_none_when_portal_errors(self):
+        self.portal.server.error_rate = 1
+        self.assertIsNone(self.client.verify(self.username, self.password))
+
+    def test_none_when_portal_is_down(self):
+        client = PortalClient('http://127.0.0.1:9', (0.5, 0.5), 2)
+        self.assertIsNone(client.verify(self.username, self.password))
+
+
+class TestAsyncPortalClient(SimpleTestCase):
+    def setUp(self):
+        self.username = fake.user_name()
+        self.password = fake.password()
+        self.portal = PortalStub({self.username: self.password}).start()
+
+    def tearDown(self):
+        self.portal.stop()
+
+    @skipIf(httpx is None, "httpx is not installed")
+    def test_valid_student(self):
+        client = AsyncPortalClient(self.portal.url, (1, 1), 2)
+        self.assertTrue(async_to_sync(client.verify)(self.username, self.password))
+
+    @skipIf(httpx is None, "httpx is not installed")
+    def test_wrong_password(self):
+        client = AsyncPortalClient(self.portal.url, (1, 1), 2)
+        self.assertFalse(async_to_sync(client.verify)(self.username, fake.password()))
+
+    def test_falls_back_to_a_thread_without_httpx(self):
+        with patch('main.portal.httpx', None):
+            client = AsyncPortalClient(self.portal.url, (1, 1), 2)
+        self.assertTrue(async_to_sync(client.verify)(self.username, self.password))
+
+
+class TestVerificationCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = VerificationCache(LocalVerificationBackend(ttl=60, max_entries=2))
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.get('student', 'secret'))
+        self.cache.set('student', 'secret', True)
+        self.assertTrue(self.cache.get('student', 'secret'))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_password_is_part_of_the_key(self):
+        self.cache.set('student', 'secret', True)
+        self.assertIsNone(self.cache.get('student', 'typo'))
+
+    def test_credentials_are_not_stored(self):
+        self.cache.set('student', 'secret', True)
+        key = next(iter(self.cache.backend.entries))
+        self.assertNotIn('student', key)
+        self.assertNotIn('secret', key)
+
+    def test_unreachable_portal_is_not_cached(self):
+        self.cache.set('student', 'secret', None)
+        self.assertFalse(self.cache.backend.entries)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('first', 'secret', True)
+        self.cache.set('second', 'secret', True)
+        self.cache.get('first', 'secret')
+        self.cache.set('third', 'secret', True)
+        self.assertTrue(self.cache.get('first', 'secret'))
+        self.assertIsNone(self.cache.get('second', 'secret'))
+
+    @patch('main.portal.time.monotonic')
+    def test_entries_expire(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        self.cache.set('student', 'secret', True)
+        monotonic_mock.return_value = 161
+        self.assertIsNone(self.cache.get('student', 'secret'))
+
+    def test_shared_backend(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'portal'}}
+        with self.settings(CACHES=locmem, STUDENT_VERIFICATION_CACHE='default'):
+            cache = verification_cache()
+            cache.set('student', 'secret', False)
+            self.assertIs(cache.get('student', 'secret'), False)
+
+
+class TestCachedValidateStudent(SimpleTestCase):
+    @patch('main.forms.portal_client')
+    def test_repeat_login_skips_the_portal(self, client_mock):
+        client_mock.return_value.verify.return_value = True
+        with self.settings(STUDENT_VERIFICATION_CACHE='local', STUDENT_VERIFICATION_CACHE_TTL=60):
+            username = fake.user_name()
+            self.assertTrue(validate_student(username, 'secret'))
+            self.assertTrue(validate_student(username, 'secret'))
+        self.assertEqual(client_mock.return_value.verify.call_count, 1)
+
+
+class TestCircuitBreaker(SimpleTestCase):
+    def setUp(self):
+        self.guard = PortalGuard(CircuitBreaker(window=4, failure_rate=0.5, min_calls=4, reset_timeout=30), Bulkhead(2, 0.1))
+
+    def fail(self):
+        return self.guard.call(lambda: None)
+
+    def succeed(self):
+        return self.guard.call(lambda: True)
+
+    def test_stays_closed_below_failure_rate(self):
+        for outcome in (self.succeed, self.succeed, self.succeed, self.fail):
+            outcome()
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_and_fails_fast(self):
+        for outcome in (self.succeed, self.succeed, self.fail, self.fail):
+            outcome()
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(PortalUnavailable):
+            self.succeed()
+        self.assertEqual(self.guard.stats()['circuit_rejected'], 1)
+
+    @patch('main.portal.time.monotonic')
+    def test_half_open_trial_closes_it(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        for _ in range(4):
+            self.fail()
+        monotonic_mock.return_value = 131
+        self.assertTrue(self.succeed())
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('main.portal.time.monotonic')
+    def test_failed_trial_opens_it_again(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        for _ in range(4):
+            self.fail()
+        monotonic_mock.return_value = 131
+        self.fail()
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.guard.breaker.opened, 2)
+
+
+    @patch('main.portal.time.monotonic')
+    def test_trial_that_raises_counts_as_failed(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        for _ in range(4):
+            self.fail()
+
+        def broken_portal():
+            raise RuntimeError("portal client bug")
+
+        monotonic_mock.return_value = 131
+        with self.assertRaises(RuntimeError):
+            self.guard.call(broken_portal)
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.guard.stats()['in_flight'], 0)
+        monotonic_mock.return_value = 162
+        self.assertTrue(self.succeed())
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('main.portal.time.monotonic')
+    def test_cancelled_trial_counts_as_failed(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        for _ in range(4):
+            self.fail()
+        monotonic_mock.return_value = 131
+
+        async def slow_portal():
+            await asyncio.sleep(10)
+            return True
+
+        async def cancelled_login():
+            login = asyncio.ensure_future(self.guard.acall(slow_portal))
+            await asyncio.sleep(0)
+            login.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await login
+
+        async_to_sync(cancelled_login)()
+        self.assertEqual(self.guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.guard.breaker.trial_running)
+        self.assertEqual(self.guard.stats()['in_flight'], 0)
+        monotonic_mock.return_value = 162
+        self.assertTrue(self.succeed())
+
+    @patch('main.portal.time.monotonic')
+    def test_bulkhead_rejection_does_not_claim_the_trial(self, monotonic_mock):
+        monotonic_mock.return_value = 100
+        for _ in range(4):
+            self.fail()
+        monotonic_mock.return_value = 131
+        guard = self.guard
+        for _ in range(guard.bulkhead.max_in_flight):
+            guard.bulkhead.acquire()
+        with self.assertRaises(PortalUnavailable):
+            self.succeed()
+        for _ in range(guard.bulkhead.max_in_flight):
+            guard.bulkhead.release()
+        self.assertFalse(guard.breaker.trial_running)
+        self.assertTrue(self.succeed())
+        self.assertEqual(guard.breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestBulkhead(SimpleTestCase):
+    def test_calls_beyond_the_cap_fail_fast(self):
+        guard = PortalGuard(CircuitBreaker(20, 0.5, 10, 30), Bulkhead(1, 0.05))
+        entered, leave = threading.Event(), threading.Event()
+
+        def slow_portal():
+            entered.set()
+            leave.wait(1)
+            return True
+
+        worker = threading.Thread(target=guard.call, args=(slow_portal,))
+        worker.start()
+        entered.wait(1)
+        with self.assertRaises(PortalUnavailable):
+            guard.call(lambda: True)
+        leave.set()
+        worker.join()
+        self.assertEqual(guard.stats()['bulkhead_rejected'], 1)
+        self.assertEqual(guard.stats()['in_flight'], 0)
+        self.assertTrue(guard.call(lambda: True))
+
+
+    def test_async_calls_wait_for_a_slot(self):
+        guard = PortalGuard(CircuitBreaker(20, 0.5, 10, 30), Bulkhead(1, 1))
+
+        async def slow_portal():
+            await asyncio.sleep(0.05)
+            return True
+
+        async def logins():
+            return await asyncio.gather(guard.acall(slow_portal), guard.acall(slow_portal))
+
+        self.assertEqual(async_to_sync(logins)(), [True, True])
+        self.assertEqual(guard.stats()['bulkhead_rejected'], 0)
+        self.assertEqual(guard.stats()['in_flight'], 0)
+
+    def test_async_calls_give_up_after_the_queue_timeout(self):
+        guard = PortalGuard(CircuitBreaker(20, 0.5, 10, 30), Bulkhead(1, 0.05))
+
+        async def slow_portal():
+            await asyncio.sleep(0.3)
+            return True
+
+        async def logins():
+            return await asyncio.gather(guard.acall(slow_portal), guard.acall(slow_portal), return_exceptions=True)
+
+        first, second = async_to_sync(logins)()
+        self.assertTrue(first)
+        self.assertIsInstance(second, PortalUnavailable)
+        self.assertEqual(guard.stats()['bulkhead_rejected'], 1)
+        self.assertEqual(guard.stats()['in_flight'], 0)
+
+
+class TestRegFormWhenPortalIsUnavailable(TestCase):
+    @patch('main.forms.validate_student', side_effect=PortalUnavailable)
+    def test_try_again_shortly(self, validate_mock):
+        start = datetime.now(timezone.utc)
+        Election.objects.create(name='An election', start=start, end=start + timedelta(days=1), started=True)
+        form = RegForm(data={'username': 'MOU1001', 'password': 'secret'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.non_field_errors(), ['The student portal is busy, try again shortly'])
@@ -0,0 +1,101 @@
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+import sys
+import threading
+import time
+
+from main.models import User, RequestProfile
+from main.profiling import Sampler, fold
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestSampler(SimpleTestCase):
+    def test_fold_is_outermost_first(self):
+        def inner():
+            return fold(sys._getframe())
+        stack = inner().split(';')
+        self.assertTrue(stack[-1].startswith('inner (test_profiling.py:'))
+        self.assertTrue(stack[-2].startswith('test_fold_is_outermost_first (test_profiling.py:'))
+
+    def test_samples_the_busy_thread(self):
+        with Sampler(threading.get_ident(), 0.001) as sampler:
+            spin(0.1)
+        self.assertGreater(sum(sampler.stacks.values()), 10)
+        top = sampler.folded().splitlines()[0]
+        stack, count = top.rsplit(' ', 1)
+        self.assertIn('spin (test_profiling.py:', stack.split(';')[-1])
+        self.assertGreater(int(count), 0)
+
+
+@override_settings(PROFILE_INTERVAL=0.001)
+class TestProfileMiddleware(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+
+    def test_staff_query_flag(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('list') + '?profile=1')
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.view, 'list')
+        self.assertEqual(profile.path, '/list/?profile=1')
+        self.assertEqual(profile.status, 200)
+        self.assertEqual(profile.samples, sum(int(line.rsplit(' ', 1)[1]) for line in profile.stacks.splitlines()))
+
+    def test_staff_header(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('list'), HTTP_X_PROFILE='1')
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_not_for_everyone_else(self):
+        response = self.client.get(reverse('reg') + '?profile=1', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_off_by_default(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('list'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sample_rate(self):
+        self.client.get(reverse('reg'))
+        self.assertEqual(RequestProfile.objects.get().view, 'reg')
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=2)
+    def test_only_the_latest_are_kept(self):
+        for _ in range(3):
+            self.client.get(reverse('thanks'))
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+
+class TestProfileViews(TestCase):
+    def setUp(self):
+        self.profile = RequestProfile.objects.create(
+            path='/result/', view='result', status=200, seconds=0.5, samples=3,
+            stacks="main (manage.py:1);get (views.py:10) 3\n",
+        )
+
+    def test_staff_only(self):
+        response = self.client.get(reverse('download_profile', args=[self.profile.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('Content-Disposition', response)
+
+    def test_list_and_download(self):
+        self.client.force_login(User.objects.create_user(username='staff', password='staff', is_staff=True))
+        response = self.client.get(reverse('profiles'))
+        self.assertContains(response, reverse('download_profile', args=[self.profile.pk]))
+        response = self.client.get(reverse('download_profile', args=[self.profile.pk]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="profile-{self.profile.pk}.folded"')
+        self.assertEqual(response.content.decode('utf-8'), self.profile.stacks)
+
+    def test_missing_profile(self):
+        self.client.force_login(User.objects.create_user(username='staff', password='staff', is_staff=True))
+        response = self.client.get(reverse('download_profile', args=[self.profile.pk + 1]))
+        self.assertRedirects(response, reverse('profiles'))
@@ -0,0 +1,97 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from datetime import datetime, timedelta
+import time
+
+from main.models import Candidate, Position, User, Election, Ballot, TallyShard, ElectionArchive, EligibleVoter
+from main.ballot import cast_ballot
+from main.reset import reset_election, start_reset, reset_progress
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_reset',
+    }
+}
+
+
+def make_election(voters=5):
+    start = datetime.now(timezone.utc)
+    election = Election.objects.create(name='An election', start=start, end=start + timedelta(days=1))
+    position = Position.objects.create(name='PRESIDENT', election=election)
+    for name in ('Ada', 'Bola'):
+        candidate = Candidate.objects.create(name=name, level=100, post=position, election=election)
+        position.candidates.add(candidate)
+    ada = Candidate.objects.get(name='Ada')
+    for idx in range(voters):
+        cast_ballot(User.objects.create(username=f"MOU{idx}"), {position.pk: ada.pk})
+    User.objects.create(username='MOU999')
+    if not User.objects.filter(username='staff').exists():
+        User.objects.create_user(username='staff', password='staff', is_staff=True)
+        User.objects.create_superuser(username='admin', password='admin')
+        EligibleVoter.objects.create(student_id='MOU1', credential='x')
+    return election
+
+
+class TestResetElection(TestCase):
+    def setUp(self):
+        make_election()
+
+    def test_everything_but_the_access_accounts_is_deleted(self):
+        reset_election(batch_size=2)
+        for model in (Election, Position, Candidate, Ballot, TallyShard, Position.candidates.through):
+            self.assertFalse(model.objects.exists(), model)
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), {'staff', 'admin'})
+
+    def test_voter_roll_is_kept(self):
+        reset_election()
+        self.assertTrue(EligibleVoter.objects.exists())
+
+    def test_results_are_archived_first(self):
+        reset_election()
+        archive = ElectionArchive.objects.get()
+        self.assertEqual(archive.name, 'An election')
+        self.assertEqual(archive.ballots, 5)
+        self.assertEqual((archive.voted, archive.registered), (5, 6))
+        self.assertEqual(archive.standings[0]['winner'], 'Ada')
+
+    def test_query_count_does_not_grow_with_the_election(self):
+        with CaptureQueriesContext(connection) as small:
+            reset_election(batch_size=100)
+        make_election(voters=50)
+        with CaptureQueriesContext(connection) as large:
+            reset_election(batch_size=100)
+        self.assertEqual(len(small), len(large))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_progress(self):
+        reset_election()
+        progress = reset_progress()
+        self.assertEqual(progress['state'], 'done')
+        self.assertGreater(progress['deleted'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ELECTION_RESET_IN_BACKGROUND=True)
+class TestResetInBackground(TransactionTestCase):
+    def setUp(self):
+        make_election()
+
+    def wait_for_reset(self):
+        for _ in range(100):
+            if reset_progress()['state'] in ('done', 'failed'):
+                return reset_progress()
+            time.sleep(0.05)
+        self.fail("reset did not finish")
+
+    def test_reset_runs_in_the_background(self):
+        self.assertTrue(start_reset())
+        self.assertEqual(self.wait_for_reset()['state'], 'done')
+        self.assertFalse(Election.objects.exists())
+
+    def test_one_reset_at_a_time(self):
+        self.assertTrue(start_reset())
+        self.assertFalse(start_reset())
+        self.wait_for_reset()
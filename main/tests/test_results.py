@@ -0,0 +1,82 @@
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from main.models import Candidate, Position, User, Election, ResultSnapshot
+from main.results import compute_standings, take_snapshot, election_results
+
+from faker import Faker
+fake = Faker()
+
+class TestResults(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1)
+        )
+        self.president = Position.objects.create(name='PRESIDENT', election=self.election)
+        self.secretary = Position.objects.create(name='SECRETARY', election=self.election)
+        for name, votes in (('Ada', 5), ('Bola', 3), ('Chidi', 3)):
+            Candidate.objects.create(name=name, level=100, post=self.president, election=self.election, votes=votes)
+        for name in ('Dayo', 'Emeka'):
+            Candidate.objects.create(name=name, level=200, post=self.secretary, election=self.election, votes=2)
+        User.objects.create(username='voter1', hasVoted=True)
+        User.objects.create(username='voter2')
+        User.objects.create_superuser(username='admin', password='admin')
+
+    def test_standings_in_one_query(self):
+        with self.assertNumQueries(1):
+            standings = compute_standings(self.election)
+        president, secretary = standings
+        self.assertEqual(president['position'], 'PRESIDENT')
+        self.assertEqual(president['total'], 11)
+        self.assertEqual(president['winner'], 'Ada')
+        self.assertEqual(president['margin'], 2)
+        self.assertEqual(
+            [(c['name'], c['votes'], c['rank']) for c in president['candidates']],
+            [('Ada', 5, 1), ('Bola', 3, 2), ('Chidi', 3, 2)]
+        )
+        self.assertEqual(president['candidates'][0]['share'], 45.5)
+        self.assertIsNone(secretary['winner'])
+
+    def test_turnout_leaves_out_staff(self):
+        snapshot = take_snapshot(self.election)
+        self.assertEqual((snapshot.voted, snapshot.registered), (1, 2))
+        self.assertEqual(snapshot.turnout, 50.0)
+
+    def test_fresh_snapshot_is_reused(self):
+        take_snapshot(self.election)
+        Candidate.objects.filter(name='Bola').update(votes=10)
+        self.assertEqual(election_results(self.election).standings[0]['winner'], 'Ada')
+
+    @override_settings(RESULTS_SNAPSHOT_SECONDS=0)
+    def test_stale_snapshot_is_recomputed(self):
+        take_snapshot(self.election)
+        Candidate.objects.filter(name='Bola').update(votes=10)
+        self.assertEqual(election_results(self.election).standings[0]['winner'], 'Bola')
+        self.assertEqual(ResultSnapshot.objects.count(), 1)
+
+    @override_settings(RESULTS_SNAPSHOT_SECONDS=0)
+    def test_snapshot_after_the_end_is_final(self):
+        Election.objects.filter(pk=self.election.pk).update(end=datetime.now(timezone.utc) - timedelta(minutes=1))
+        self.election.refresh_from_db()
+        take_snapshot(self.election)
+        Candidate.objects.filter(name='Bola').update(votes=10)
+        self.assertEqual(election_results(self.election).standings[0]['winner'], 'Ada')
+
+    def test_result_view_serves_the_snapshot(self):
+        client = Client()
+        client.login(username='admin', password='admin')
+        response = client.get(reverse('result'))
+        self.assertContains(response, 'PRESIDENT')
+        self.assertContains(response, 'Ada (by 2)')
+        self.assertNotContains(response, 'SECRETARY')
+        with patch('main.results.compute_standings') as compute_mock:
+            response = client.get(reverse('result') + '?page=2')
+        compute_mock.assert_not_called()
+        self.assertContains(response, 'SECRETARY')
@@ -1,6 +1,9 @@
 from django.contrib.messages.api import get_messages
-from main.forms import CandidateRegistrationForm
-from django.test import TestCase, Client
+from main.forms import CandidateRegistrationForm, PositionRegistrationForm
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
 
@@ -9,7 +12,7 @@ from datetime import datetime, timedelta
 
 from unittest.mock import patch
 
-from main.models import Candidate, Position, User, Election
+from main.models import Candidate, Position, User, Election, Ballot, refresh_election_status, catalog_version
 from main.views import (
     CandidateRegistrationView, 
     PositionRegistrationView
@@ -19,8 +22,8 @@ from faker import Faker
 fake = Faker()
 
 class TestRegFormView(TestCase):
-    @patch('main.forms.requests.post')
-    def setUp(self, response_mock):
+    @patch('main.forms.validate_student', return_value=True)
+    def setUp(self, validate_mock):
         start = datetime.now(timezone.utc)
         delta = timedelta(days=1)
         self.election = Election.objects.create(
@@ -28,8 +31,6 @@ class TestRegFormView(TestCase):
             start = start,
             end = start + delta
         )
-        response_mock_url = 'https://mouauportal.edu.ng/my-account-student.php'
-        response_mock.return_value.url = response_mock_url 
         self.data = {
             'username': 'SKH3833',
             'password': 'SKH3833'
@@ -44,10 +45,8 @@ class TestRegFormView(TestCase):
         self.assertEqual(self.response.status_code, 302)
         self.assertEqual(self.response.url, reverse('vote'))
 
-    @patch('main.forms.requests.post')
-    def test_redirect_to_vote_for_users_that_have_voted_before(self, response_mock):
-        response_mock_url = 'https://mouauportal.edu.ng/my-account-student.php'
-        response_mock.return_value.url = response_mock_url 
+    @patch('main.forms.validate_student', return_value=True)
+    def test_redirect_to_vote_for_users_that_have_voted_before(self, validate_mock):
         user = User.objects.get(username=self.data.get('username'))
         user.hasVoted = True
         user.save()
@@ -65,9 +64,9 @@ class TestVoteFormviewGetContextData(TestCase):
             start = start,
             end = start + delta
         )
-        self.position1 = Position.objects.create(name=fake.text())
-        self.position2 = Position.objects.create(name=fake.text())
-        self.position3 = Position.objects.create(name=fake.text())
+        self.position1 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position2 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position3 = Position.objects.create(name=fake.text(), election=self.election)
         self.candidate1 = Candidate.objects.create(
             name = fake.name(),
             level = fake.random_element(elements=(100, 200, 300, 400, 500)),
@@ -171,8 +170,8 @@ class TestVoteFormViewPost(TestCase):
             votes = fake.random_int()
         )
         self.data = {
-            self.position1.name: self.candidate2.name,
-            self.position3.name: self.candidate4,
+            f'position-{self.position1.pk}': self.candidate2.pk,
+            f'position-{self.position2.pk}': self.candidate4.pk,
             'some_data': 'some_value'
         }
         self.user = User.objects.create(username=fake.user_name())
@@ -193,26 +192,23 @@ class TestVoteFormViewPost(TestCase):
         self.assertEqual(response.url, reverse('reg'))
 
     def test_candidate_vote_has_been_added(self):
-        votes2 = self.candidate2.votes
-        votes4 = self.candidate4.votes
-        self.candidate2.refresh_from_db()
-        self.candidate4.refresh_from_db()
-        self.assertEqual(self.candidate2.votes, votes2+1)
-        self.assertEqual(self.candidate4.votes, votes4+1)
+        tallies = Candidate.objects.with_tallies()
+        self.assertEqual(tallies.get(pk=self.candidate2.pk).tally, self.candidate2.votes+1)
+        self.assertEqual(tallies.get(pk=self.candidate4.pk).tally, self.candidate4.votes+1)
 
     def test_candidates_not_voted_for_has_no_vote_increase(self):
-        votes1 = self.candidate1.votes
-        votes3 = self.candidate3.votes
-        votes5 = self.candidate5.votes
-        votes6 = self.candidate6.votes
-        self.candidate1.refresh_from_db()
-        self.candidate3.refresh_from_db()
-        self.candidate5.refresh_from_db()
-        self.candidate6.refresh_from_db()
-        self.assertEqual(self.candidate1.votes, votes1)
-        self.assertEqual(self.candidate3.votes, votes3)
-        self.assertEqual(self.candidate5.votes, votes5)
-        self.assertEqual(self.candidate6.votes, votes6)
+        tallies = Candidate.objects.with_tallies()
+        self.assertEqual(tallies.get(pk=self.candidate1.pk).tally, self.candidate1.votes)
+        self.assertEqual(tallies.get(pk=self.candidate3.pk).tally, self.candidate3.votes)
+        self.assertEqual(tallies.get(pk=self.candidate5.pk).tally, self.candidate5.votes)
+        self.assertEqual(tallies.get(pk=self.candidate6.pk).tally, self.candidate6.votes)
+
+    def test_ballot_is_in_the_ledger(self):
+        ballot = Ballot.objects.get()
+        self.assertEqual(
+            set(ballot.choices.values_list('candidate', flat=True)),
+            {self.candidate2.pk, self.candidate4.pk}
+        )
 
     def test_non_candidate_data_in_request_post_is_ignored_and_redirects_correctly(self):
         self.assertEqual(self.response.status_code, 302)
@@ -290,9 +286,9 @@ class TestPositionAndCandidateList(TestCase):
             end = start + delta
         )
         self.admin, created = User.objects.get_or_create(username='admin', is_staff=True, is_superuser=True)
-        self.position1 = Position.objects.create(name=fake.text())
-        self.position2 = Position.objects.create(name=fake.text())
-        self.position3 = Position.objects.create(name=fake.text())
+        self.position1 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position2 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position3 = Position.objects.create(name=fake.text(), election=self.election)
         self.candidate1 = Candidate.objects.create(
             name = fake.name(),
             level = fake.random_element(elements=(100, 200, 300, 400, 500)),
@@ -520,9 +516,9 @@ class TestVotersList(TestCase):
             end = start + delta
         )
         self.admin, created = User.objects.get_or_create(username='admin', is_staff=True, is_superuser=True)
-        self.position1 = Position.objects.create(name=fake.text())
-        self.position2 = Position.objects.create(name=fake.text())
-        self.position3 = Position.objects.create(name=fake.text())
+        self.position1 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position2 = Position.objects.create(name=fake.text(), election=self.election)
+        self.position3 = Position.objects.create(name=fake.text(), election=self.election)
         self.candidate1 = Candidate.objects.create(
             name = fake.name(),
             level = fake.random_element(elements=(100, 200, 300, 400, 500)),
@@ -613,6 +609,9 @@ class TestCancelElectionView(TestCase):
         with self.assertRaises(Election.DoesNotExist):
             self.election.refresh_from_db()
 
+    def test_cached_election_is_dropped(self):
+        self.assertIsNone(refresh_election_status())
+
     def test_success_message(self):
         messages = list(get_messages(self.response.wsgi_request))
         self.assertEqual(len(messages), 1)
@@ -692,4 +691,209 @@ class TestChangeAdminCodeView(TestCase):
 
     def test_successful_redirect(self):
         self.assertEqual(self.response.status_code, 302)
-        self.assertEqual(self.response.url, reverse('change-codes'))
\ No newline at end of file
+        self.assertEqual(self.response.url, reverse('change-codes'))
+
+class TestAdminDashboardQueryCount(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1)
+        )
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+        self.client = Client()
+        self.client.force_login(user=self.admin)
+        self.client.get(reverse('list'))
+
+    def test_list_queries(self):
+        # session, user, candidates, positions
+        with self.assertNumQueries(4):
+            self.client.get(reverse('list'))
+
+    def test_manage_queries(self):
+        # session, user, election, candidate and position counts
+        with self.assertNumQueries(5):
+            self.client.get(reverse('manage'))
+
+
+def make_ballot(election, positions, candidates):
+    for idx in range(positions):
+        position = Position.objects.create(name=f"POSITION {idx}", election=election)
+        for number in range(candidates):
+            candidate = Candidate.objects.create(
+                name = f"Candidate {idx} {number}",
+                level = 100,
+                post = position,
+                election = election
+            )
+            position.candidates.add(candidate)
+
+
+class TestBallotPagesQueryCount(TestCase):
+    """the ballot, voters list and admin list cost the same however big the ballot is"""
+
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1)
+        )
+        self.voter = User.objects.create(username=fake.user_name())
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+
+    def count_queries(self, url, user=None):
+        client = Client()
+        if user:
+            client.force_login(user=user)
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, user=None):
+        make_ballot(self.election, 1, 1)
+        small = self.count_queries(url, user)
+        Candidate.objects.all().delete()
+        Position.objects.all().delete()
+        make_ballot(self.election, 8, 5)
+        self.assertEqual(self.count_queries(url, user), small)
+
+    def test_vote_page(self):
+        self.assertConstantQueries(reverse('vote'), self.voter)
+
+    def test_voters_list(self):
+        self.assertConstantQueries(reverse('vlist'))
+
+    def test_admin_list(self):
+        self.assertConstantQueries(reverse('list'), self.admin)
+
+    def test_other_elections_are_left_out(self):
+        make_ballot(self.election, 1, 1)
+        Position.objects.create(name="OLD POSITION")
+        response = Client().get(reverse('vlist'))
+        self.assertEqual([position.name for position in response.context['positions']], ["POSITION 0"])
+
+class TestRegFormViewVoterPassword(TestCase):
+    def setUp(self):
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1),
+            started = True
+        )
+        self.data = {
+            'username': 'SKH3833',
+            'password': 'SKH3833'
+        }
+
+    @patch('main.forms.validate_student', return_value=True)
+    def post(self, validate_mock):
+        return Client().post(reverse('reg'), data=self.data)
+
+    def test_voter_is_logged_in_without_a_usable_password(self):
+        response = self.post()
+        user = User.objects.get(username='SKH3833')
+        self.assertEqual(response.url, reverse('vote'))
+        self.assertEqual(response.wsgi_request.user, user)
+        self.assertFalse(user.has_usable_password())
+
+    def test_cheap_hasher_for_voters(self):
+        with self.settings(VOTER_PASSWORD_HASHER='pbkdf2_voter'):
+            self.post()
+        user = User.objects.get(username='SKH3833')
+        self.assertTrue(user.password.startswith('pbkdf2_voter$'))
+        self.assertTrue(user.check_password('SKH3833'))
+
+    def test_returning_voter_is_logged_in(self):
+        self.post()
+        response = self.post()
+        self.assertEqual(response.url, reverse('vote'))
+        self.assertEqual(User.objects.filter(username='SKH3833').count(), 1)
+
+    def test_staff_and_admin_cannot_log_in_as_voters(self):
+        User.objects.create_user(username='staff', password='staff', is_staff=True)
+        User.objects.create_superuser(username='admin', password='admin')
+        for username in ('staff', 'admin'):
+            self.data = {'username': username, 'password': 'anything'}
+            response = self.post()
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'No student has that username and password')
+            self.assertFalse(response.wsgi_request.user.is_authenticated)
+        client = Client()
+        with patch('main.forms.validate_student', return_value=True):
+            client.post(reverse('reg'), data={'username': 'admin', 'password': 'anything'})
+        response = client.get(reverse('manage'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_staff_keep_the_default_hasher(self):
+        staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+        self.assertTrue(staff.password.startswith('pbkdf2_sha256$'))
+
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_views',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestBallotFragmentCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        start = datetime.now(timezone.utc)
+        self.election = Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = start,
+            end = start + timedelta(days=1)
+        )
+        make_ballot(self.election, 2, 2)
+        self.voter = User.objects.create(username=fake.user_name())
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+        self.client = Client()
+        self.client.force_login(user=self.voter)
+
+    def test_ballot_is_served_from_the_cache(self):
+        first = self.client.get(reverse('vote'))
+        with self.assertNumQueries(2):
+            # session and user only
+            second = self.client.get(reverse('vote'))
+        self.assertContains(second, "Candidate 1 1")
+        self.assertEqual(first.content.count(b'type="radio"'), second.content.count(b'type="radio"'))
+
+    def test_voters_list_is_served_from_the_cache(self):
+        Client().get(reverse('vlist'))
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('vlist'))
+        self.assertContains(response, "Candidate 1 1")
+
+    def test_deleting_a_candidate_refreshes_the_ballot(self):
+        self.client.get(reverse('vote'))
+        staff = Client()
+        staff.force_login(user=self.admin)
+        staff.get(reverse('delete_candidate', kwargs={'pk': Candidate.objects.get(name="Candidate 1 1").pk}))
+        self.assertNotContains(self.client.get(reverse('vote')), "Candidate 1 1")
+
+    def test_deleting_a_position_refreshes_the_voters_list(self):
+        Client().get(reverse('vlist'))
+        staff = Client()
+        staff.force_login(user=self.admin)
+        staff.get(reverse('delete_position', kwargs={'pk': Position.objects.get(name="POSITION 1").pk}))
+        self.assertNotContains(Client().get(reverse('vlist')), "POSITION 1")
+
+    def test_registering_bumps_the_catalog_version(self):
+        version = catalog_version()
+        Election.objects.create(
+            name = fake.sentence(nb_words=2),
+            start = self.election.start + timedelta(days=1),
+            end = self.election.end + timedelta(days=1)
+        )
+        form = PositionRegistrationForm(data={'name': 'new position'})
+        form.is_valid()
+        form.save(form)
+        self.assertEqual(catalog_version(), version + 1)
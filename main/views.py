@@ -1,21 +1,99 @@
-from django.http.response import HttpResponseRedirect
+from django.http.response import HttpResponse, HttpResponseRedirect
 from django.views.generic import FormView, TemplateView, View, ListView
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.db.models import Prefetch
+
+from io import TextIOWrapper
+from pathlib import Path
+import time
 
 from main.forms import (
     RegForm, 
     CandidateRegistrationForm,
     PositionRegistrationForm,
+    BallotImportForm,
     AccessCodeForm,
     StartElectionForm,
     ChangeStaffCodeForm,
     ChangeAdminCodeForm,
 )
-from main.models import Candidate, Position, User, Election, refresh_election_status
+from main.models import (
+    Candidate,
+    Position,
+    User,
+    Election,
+    RequestProfile,
+    current_election,
+    catalog_version,
+    bump_catalog_version,
+    refresh_election_status,
+)
 from main.mixins import UserRequiredMixin, StaffRequiredMixin, AdminRequiredMixin
+from main.ballot import submit_ballot, ballot_choices, AlreadyVoted
+from main.results import election_results
+from main.importers import parse_rows, import_ballot
+from main.reset import start_reset, reset_progress
+from main.metrics import render_metrics
+
+
+def voter_password(password):
+    """the password field for a new voter account, hashed as VOTER_PASSWORD_HASHER says"""
+    hasher = getattr(settings, 'VOTER_PASSWORD_HASHER', None)
+    if hasher is None:
+        return make_password(None)
+    return make_password(password, hasher=hasher)
+
+
+def election_candidates(election):
+    if election is None:
+        return Candidate.objects.none()
+    return Candidate.objects.filter(election=election).select_related('post')
+
+
+def election_positions(election):
+    """the election's positions with their candidates, in two queries however many there are"""
+    if election is None:
+        return Position.objects.none()
+    return Position.objects.filter(election=election).order_by('pk').prefetch_related(
+        Prefetch('candidates', queryset=election_candidates(election))
+    )
+
+
+def ballot_context():
+    """what the ballot and the voters list render from"""
+    election = current_election()
+    return {
+        'election': election,
+        'catalog_version': catalog_version(),
+        'candidates': election_candidates(election),
+        'positions': election_positions(election),
+    }
+
+
+def voter_login(request, username, password):
+    """logs in a student the form has already verified, creating their account on first login
+
+    There is no authenticate() and no stored password to check, so the
+    staff and admin accounts are never logged in this way; None is
+    returned for them instead.
+    """
+    try:
+        user = User.objects.get(username=username, is_staff=False, is_superuser=False)
+    except User.DoesNotExist:
+        user, created = User.objects.get_or_create(
+            username=username,
+            defaults={'password': voter_password(password)}
+        )
+        if user.is_staff or user.is_superuser:
+            return None
+    login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+    return user
+
 
 class HomeView(TemplateView):
     template_name = "main/home.html"
@@ -35,15 +113,11 @@ class RegFormView(FormView):
         return super().get(request, *args, **kwargs)
 
     def form_valid(self, form):
-        username = form.cleaned_data.get("username")
-        password = form.cleaned_data.get("password")
-        user, created = User.objects.get_or_create(username=username)
-        if created:
-            user.set_password(password)
-            user.save()
-        auth_user = authenticate(username=username, password=password)
-        login(self.request, auth_user)
-        if auth_user.hasVoted:
+        user = voter_login(self.request, form.cleaned_data.get("username"), form.cleaned_data.get("password"))
+        if user is None:
+            form.add_error(None, 'No student has that username and password')
+            return self.form_invalid(form)
+        if user.hasVoted:
             return HttpResponseRedirect(reverse('thanks'))
         return super(RegFormView, self).form_valid(form)
 
@@ -53,8 +127,7 @@ class VotersListView(TemplateView):
 
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
-        kwargs['candidates'] = Candidate.objects.all()
-        kwargs['positions'] = Position.objects.all()
+        kwargs.update(ballot_context())
         return kwargs
 
 
@@ -63,22 +136,14 @@ class VoteFormView(UserRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         kwargs = super(VoteFormView, self).get_context_data(**kwargs)
-        kwargs['candidates'] = Candidate.objects.all()
-        kwargs['positions'] = Position.objects.all()
+        kwargs.update(ballot_context())
         return kwargs
 
     def post(self, request, *args, **kwargs):
-        data = request.POST.copy()
-        for position in data:
-            try:
-                candidate = Candidate.objects.get(name=data[position])
-                candidate.votes += 1
-                candidate.save()
-            except Candidate.DoesNotExist:
-                pass
-        user = self.request.user
-        user.hasVoted = True
-        user.save()
+        try:
+            submit_ballot(request.user, ballot_choices(request.POST))
+        except AlreadyVoted:
+            pass
         logout(self.request)
         return HttpResponseRedirect(reverse('thanks'))
 
@@ -108,13 +173,36 @@ class PositionRegistrationView(StaffRequiredMixin, FormView):
         return super(PositionRegistrationView, self).form_valid(form)
 
 
+class BallotImportView(StaffRequiredMixin, FormView):
+    form_class = BallotImportForm
+    template_name = "main/import_form.html"
+    success_url = reverse_lazy('list')
+
+    def form_valid(self, form):
+        upload = form.cleaned_data.get("file")
+        start = time.perf_counter()
+        try:
+            rows = parse_rows(TextIOWrapper(upload.file, encoding='utf-8', newline=''), Path(upload.name).suffix)
+            positions, candidates = import_ballot(rows)
+        except (ValueError, KeyError) as error:
+            form.add_error('file', f"Could not import the file: {error}")
+            return self.form_invalid(form)
+        elapsed = time.perf_counter() - start
+        messages.add_message(
+            self.request, messages.SUCCESS,
+            f"Added {positions} positions and {candidates} candidates from {len(rows)} rows in {elapsed:.2f}s"
+        )
+        return super(BallotImportView, self).form_valid(form)
+
+
 class PositionAndCandidateList(StaffRequiredMixin, TemplateView):
     template_name = "main/list.html"
 
     def get_context_data(self, **kwargs):
         kwargs = super(PositionAndCandidateList, self).get_context_data(**kwargs)
-        kwargs['candidates'] = Candidate.objects.all()
-        kwargs['positions'] = Position.objects.all()
+        election = current_election()
+        kwargs['candidates'] = election_candidates(election)
+        kwargs['positions'] = election_positions(election)
         return kwargs
 
 class DeleteCandidate(StaffRequiredMixin, View):
@@ -126,6 +214,7 @@ class DeleteCandidate(StaffRequiredMixin, View):
             messages.add_message(request, messages.WARNING, "Candidate does not exist")
             return HttpResponseRedirect(reverse("list"))
         candidate.delete()
+        bump_catalog_version()
         messages.add_message(request, messages.ERROR, "Candidate has been deleted")
         return HttpResponseRedirect(reverse("list"))
 
@@ -139,6 +228,7 @@ class DeletePosition(StaffRequiredMixin, View):
             messages.add_message(request, messages.WARNING, "Position does not exist")
             return HttpResponseRedirect(reverse("list"))
         position.delete()
+        bump_catalog_version()
         messages.add_message(request, messages.ERROR, "Position has been deleted")
         return HttpResponseRedirect(reverse("list"))
 
@@ -192,24 +282,66 @@ class ManageElectionView(AdminRequiredMixin, FormView):
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
         kwargs['election'] = Election.objects.last()
+        kwargs['reset'] = reset_progress()
         return kwargs
 
     
 class CancelElectionView(AdminRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        User.objects.exclude(username="staff").exclude(username="admin").delete()
-        Election.objects.all().delete()
-        messages.add_message(request, messages.SUCCESS, "Election has been deleted parmanently")
+        if not start_reset():
+            messages.add_message(request, messages.WARNING, "The election is already being deleted")
+        elif getattr(settings, 'ELECTION_RESET_IN_BACKGROUND', True):
+            messages.add_message(request, messages.SUCCESS, "The election is being deleted, its results have been archived")
+        else:
+            messages.add_message(request, messages.SUCCESS, "Election has been deleted parmanently")
         return HttpResponseRedirect(reverse('manage'))
 
     
 class ResultView(AdminRequiredMixin, ListView):
     template_name = 'main/result.html'
-    model = Position
     context_object_name = 'positions'
     paginate_by = 1
+
+    def get_queryset(self):
+        election = current_election()
+        if election is None:
+            self.snapshot = None
+            return []
+        self.snapshot = election_results(election)
+        return self.snapshot.standings
+
+    def get_context_data(self, **kwargs):
+        kwargs = super().get_context_data(**kwargs)
+        kwargs['snapshot'] = self.snapshot
+        return kwargs
     
 
+class MetricsView(StaffRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileListView(StaffRequiredMixin, ListView):
+    model = RequestProfile
+    template_name = 'main/profiles.html'
+    context_object_name = 'profiles'
+
+    def get_queryset(self):
+        return RequestProfile.objects.defer('stacks')
+
+
+class ProfileDownloadView(StaffRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        try:
+            profile = RequestProfile.objects.get(pk=kwargs.get('pk'))
+        except RequestProfile.DoesNotExist:
+            messages.add_message(request, messages.WARNING, "Profile does not exist")
+            return HttpResponseRedirect(reverse("profiles"))
+        response = HttpResponse(profile.stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
+
+
 class ChangeAccessCodeView(AdminRequiredMixin, TemplateView):
     template_name = 'main/change_codes.html'
 
@@ -2,6 +2,20 @@
 ASGI config for voting project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+/result/stream/ is answered by main.live.results_stream; everything else
+goes to Django, with voting.asgi_settings routing the login, ballot and
+result pages to the async views in main.async_views.
+
+Run it under an ASGI server, one event loop per worker process, e.g.
+
+    pip install uvicorn httpx
+    uvicorn voting.asgi:application --workers 4 --timeout-keep-alive 5
+
+httpx lets portal logins wait on the event loop instead of a thread, so a
+worker can hold many logins waiting on the portal at once; without it each
+waiting login holds a thread. STUDENT_PORTAL_MAX_IN_FLIGHT still caps how
+many of them reach the portal. With several workers, point CACHES at a
+shared backend.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -11,6 +25,14 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voting.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voting.asgi_settings')
+
+django_application = get_asgi_application()
+
+from main.live import results_stream  # noqa: E402 needs the apps loaded
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/result/stream/':
+        return await results_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,4 @@
+from .settings import *
+
+# Served by voting.asgi: the login, ballot and result pages use async views.
+ROOT_URLCONF = 'voting.async_urls'
@@ -0,0 +1,20 @@
+"""voting URL Configuration for ASGI
+
+The same routes as voting.urls, with the login, ballot and result pages
+answered by the async views in main.async_views.
+"""
+from django.urls import path
+
+from main.async_views import reg, vote, result
+from voting.urls import urlpatterns as sync_urlpatterns
+
+async_views = {
+    'reg': reg,
+    'vote': vote,
+    'result': result,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), async_views[pattern.name], name=pattern.name) if pattern.name in async_views else pattern
+    for pattern in sync_urlpatterns
+]
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
 from pathlib import Path, PurePath
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
@@ -56,11 +57,15 @@ MESSAGE_TAGS = {
 
 
 MIDDLEWARE = [
+    # first, so it times everything below it; read at /metrics/
+    'main.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # after authentication, it checks the user is staff
+    'main.profiling.profile_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,11 +93,78 @@ WSGI_APPLICATION = 'voting.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+# SQLite by default. SQLite lets one ballot commit at a time, so production
+# runs on PostgreSQL (pip install psycopg2-binary):
+#   VOTING_DB_ENGINE=postgres, VOTING_DB_NAME, VOTING_DB_USER,
+#   VOTING_DB_PASSWORD, VOTING_DB_HOST, VOTING_DB_PORT
+#   VOTING_DB_CONN_MAX_AGE  seconds a worker keeps its connection (default 60)
+#   VOTING_DB_POOLER=1      behind PgBouncer in transaction pooling mode,
+#                           where server-side cursors can't be used
+
+VOTING_DB_ENGINE = os.environ.get('VOTING_DB_ENGINE', 'sqlite')
+
+if VOTING_DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('VOTING_DB_NAME', 'voting'),
+            'USER': os.environ.get('VOTING_DB_USER', 'voting'),
+            'PASSWORD': os.environ.get('VOTING_DB_PASSWORD', ''),
+            'HOST': os.environ.get('VOTING_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('VOTING_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('VOTING_DB_CONN_MAX_AGE', 60)),
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('VOTING_DB_POOLER') == '1',
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # seconds a write waits for the lock before "database is locked"
+                'timeout': 20,
+            },
+        }
+    }
+
+# Applied to every SQLite connection by main.sqlite.tune_sqlite; None leaves
+# SQLite's default. WAL lets voters read while a ballot is being written.
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+
+# Queue ballots to one writer thread per process that commits them in
+# batches of up to BALLOT_WRITER_BATCH_SIZE, waiting BALLOT_WRITER_LINGER
+# seconds for a batch to fill. Worth turning on for SQLite, which only
+# lets one connection write at a time.
+BALLOT_WRITER = False
+BALLOT_WRITER_BATCH_SIZE = 50
+BALLOT_WRITER_LINGER = 0.005
+
+
+# The first hasher is used for staff and admin. Voter accounts use
+# VOTER_PASSWORD_HASHER instead, see below.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'main.hashers.VoterPasswordHasher',
+]
 
-DATABASES = {
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# The catalog version behind the cached ballot and voters list lives here,
+# so with more than one worker process use a shared backend (memcached,
+# redis or the database cache) instead of local memory.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -137,3 +209,77 @@ STATIC_ROOT = PurePath.joinpath(BASE_DIR, 'static')
 STATIC_URL = '/static/'
 
 AUTH_USER_MODEL = 'main.User'
+
+# Each candidate's votes are spread over this many counter rows so that
+# concurrent ballots for the same candidate don't wait on one row lock.
+VOTE_TALLY_SHARDS = 8
+
+# How long each process trusts its cached copy of the current election.
+# Saving an Election or cancelling it clears the cache straight away.
+ELECTION_CACHE_SECONDS = 30
+
+# How old the stored election results may get before ResultView recomputes
+# them. Once a snapshot is taken after the election ended it is final.
+# `manage.py snapshot_results` refreshes it ahead of time, e.g. from cron.
+RESULTS_SNAPSHOT_SECONDS = 60
+
+# Live results (/result/stream/, served by voting.asgi): dashboards get at
+# most one update per LIVE_RESULTS_INTERVAL seconds, and the standings are
+# re-read at least every LIVE_RESULTS_POLL_SECONDS to catch ballots cast by
+# other worker processes.
+LIVE_RESULTS_INTERVAL = 0.5
+LIVE_RESULTS_POLL_SECONDS = 5
+
+# Cancelling an election archives its results, then deletes it with its
+# ballots and voters on a background thread, ELECTION_RESET_BATCH_SIZE rows
+# per statement. Progress is kept in the default cache.
+ELECTION_RESET_IN_BACKGROUND = True
+ELECTION_RESET_BATCH_SIZE = 5000
+
+# `manage.py benchmark --check` fails when a benchmark takes more than
+# BENCHMARK_TOLERANCE (0.25 is 25%) longer per operation than recorded in
+# BENCHMARK_BASELINE; `--save-baseline` records the current timings there.
+# Baselines are per machine, so the file is not committed.
+BENCHMARK_BASELINE = BASE_DIR / 'benchmark_baseline.json'
+BENCHMARK_TOLERANCE = 0.25
+
+# Staff get a sampled profile of any page by sending an X-Profile header or
+# adding ?profile=1; PROFILE_SAMPLE_RATE also profiles that fraction of all
+# requests. Stacks are sampled every PROFILE_INTERVAL seconds and the last
+# PROFILE_KEEP profiles are kept for download from /profiles/.
+PROFILE_SAMPLE_RATE = 0
+PROFILE_INTERVAL = 0.005
+PROFILE_KEEP = 50
+
+# Student portal used to verify voters. Timeouts are (connect, read) in
+# seconds; the pool caps how many connections are kept open to the portal.
+STUDENT_PORTAL_URL = 'https://mouauportal.edu.ng'
+STUDENT_PORTAL_TIMEOUT = (3, 5)
+STUDENT_PORTAL_POOL_SIZE = 20
+
+# Portal answers are remembered for STUDENT_VERIFICATION_CACHE_TTL seconds.
+# 'local' keeps them in each process (LRU, at most _SIZE entries), a cache
+# alias from CACHES shares them between workers, None turns this off.
+STUDENT_VERIFICATION_CACHE = 'local'
+STUDENT_VERIFICATION_CACHE_TTL = 600
+STUDENT_VERIFICATION_CACHE_SIZE = 10000
+
+# How RegForm checks students: 'portal', 'roll' (the imported voter roll,
+# see manage.py import_voter_roll) or 'roll_then_portal'.
+STUDENT_VERIFICATION = 'portal'
+
+# Portal circuit breaker: once _MIN_CALLS of the last _WINDOW calls are in
+# and _FAILURE_RATE of them failed, logins fail fast for _RESET_TIMEOUT
+# seconds. At most _MAX_IN_FLIGHT portal calls run at once; others wait
+# _QUEUE_TIMEOUT seconds for a slot before failing fast.
+STUDENT_PORTAL_BREAKER_WINDOW = 20
+STUDENT_PORTAL_BREAKER_FAILURE_RATE = 0.5
+STUDENT_PORTAL_BREAKER_MIN_CALLS = 10
+STUDENT_PORTAL_BREAKER_RESET_TIMEOUT = 30
+STUDENT_PORTAL_MAX_IN_FLIGHT = 10
+STUDENT_PORTAL_QUEUE_TIMEOUT = 0.5
+
+# What RegFormView stores as a new voter's password. None stores an
+# unusable password (voters are logged in straight after verification),
+# 'pbkdf2_voter' a cheap hash, 'default' the same hash staff get.
+VOTER_PASSWORD_HASHER = None
@@ -1,10 +1,26 @@
 from .settings import *
 
-DATABASES = {
+# VOTING_DB_ENGINE=postgres runs the suite against PostgreSQL instead (see tox.ini).
+if VOTING_DB_ENGINE != 'postgres':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    }
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Nothing listens here, so tests never reach the real portal by accident.
+STUDENT_PORTAL_URL = 'http://127.0.0.1:9'
+STUDENT_VERIFICATION_CACHE = None
+
+# Cached pages would leak between tests; tests that need a cache override this.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": ":memory:",
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
     }
 }
 
-EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+# Cancelling an election finishes before the response, so tests can check it.
+ELECTION_RESET_IN_BACKGROUND = False
@@ -22,6 +22,7 @@ from main.views import (
     ThanksView, 
     CandidateRegistrationView,
     PositionRegistrationView,
+    BallotImportView,
     PositionAndCandidateList,
     DeletePosition,
     DeleteCandidate,
@@ -31,6 +32,9 @@ from main.views import (
     VotersListView,
     CancelElectionView,
     ResultView,
+    MetricsView,
+    ProfileListView,
+    ProfileDownloadView,
     ChangeAccessCodeView,
     ChangeStaffCodeView,
     ChangeAdminCodeView,
@@ -44,6 +48,7 @@ urlpatterns = [
     path('thanks/', ThanksView.as_view(), name="thanks"),
     path('register/candidate/', CandidateRegistrationView.as_view(), name="register_candidate"),
     path('register/position/', PositionRegistrationView.as_view(), name="register_position"),
+    path('register/import/', BallotImportView.as_view(), name="import_ballot"),
     path('list/', PositionAndCandidateList.as_view(), name="list"),
     path('position/<pk>/delete/', DeletePosition.as_view(), name="delete_position"),
     path('candidate/<pk>/delete/', DeleteCandidate.as_view(), name="delete_candidate"),
@@ -53,6 +58,9 @@ urlpatterns = [
     path('vlist/', VotersListView.as_view(), name='vlist'),
     path('del/', CancelElectionView.as_view(), name='cancel-election'),
     path('result/', ResultView.as_view(), name='result'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('profiles/', ProfileListView.as_view(), name='profiles'),
+    path('profiles/<pk>/', ProfileDownloadView.as_view(), name='download_profile'),
     path('access/', ChangeAccessCodeView.as_view(), name='change-codes'), 
     path('staff/', ChangeStaffCodeView.as_view(), name='change-staff-code'),
     path('admin/', ChangeAdminCodeView.as_view(), name='change-admin-code'),